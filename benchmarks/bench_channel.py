@@ -0,0 +1,96 @@
+"""Compares the channel searches of the DCEL: breadth first (bfs), A* (astar) and A* with landmarks (alt).
+
+    python -m benchmarks.bench_channel --sizes 3000 10000 --pairs 200 --landmarks 16
+
+The triangles of a simple polygon form a tree, so both find its only channel there;
+perforated squares, with a grid of holes, have many channels between two points, and
+bump strips a single long, gently curving one. For random pairs of interior points, the
+channel between their triangles is searched with both methods and handed to the funnel.
+Channel is the mean number of triangles on the channel, path the mean length of the
+funnelled path relative to the one through the bfs channel, expanded the mean number of
+edge crossings A* expands, search the mean time of the search alone and funnel that of
+the funnel. Landmarks are selected once per mesh, in the time given as prep.
+Landmarks only speed astar up, so alt must find channels of the same cost; the
+benchmark stops with an error if it does not.
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.bench_delaunay import interior_points
+from benchmarks.common import bump_polygon, comb_polygon, load_shapes, perforated_polygon, star_polygon, timed
+from lib.point_location.geo.shapes import Polygon
+from lib.point_location.kirkpatrick import SinglePolygonLocator
+
+
+def path_length(path: np.ndarray) -> float:
+    return float(np.hypot(*np.diff(path, axis=0).T).sum())
+
+
+def channel_cost(dcel, channel: list[int], p, q) -> float:
+    """Returns the cost astar gives CHANNEL: the length from P through the midpoints of its crossings to Q."""
+    xy = [(p.x, p.y)]
+    for t, u in zip(channel, channel[1:]):
+        c = 3 * t + dcel.neighbors[t].tolist().index(u)
+        xy.append((dcel._portal_xy[2 * c], dcel._portal_xy[2 * c + 1]))
+    xy.append((q.x, q.y))
+    return path_length(np.array(xy))
+
+
+def measure(polygon: Polygon, pairs: list, landmarks: int):
+    locator = SinglePolygonLocator(polygon.triangulation, polygon)
+    dcel = locator.dcel
+    # The lists astar searches are built once per mesh, outside of the timing.
+    dcel._search_graph()
+    ends = [(p, q, locator.local_id(locator.locate(p)), locator.local_id(locator.locate(q))) for p, q in pairs]
+    results = {}
+    costs = {}
+    prep = 0.0
+    for name in ('bfs', 'astar', 'alt'):
+        if name == 'alt':
+            _, prep = timed(dcel.select_landmarks, landmarks)
+        search = (lambda s, g, p, q: dcel.bfs(s, g)) if name == 'bfs' else dcel.astar
+        dcel.expansions = 0
+        channels, seconds = timed(lambda: [search(s, g, p, q) for p, q, s, g in ends])
+        paths, funnel_seconds = timed(lambda: [dcel.funnel(channel, p, q) for channel, (p, q, _, _) in zip(channels, ends)])
+        lengths = [path_length(path) for path in paths]
+        costs[name] = np.array([channel_cost(dcel, channel, p, q) for channel, (p, q, _, _) in zip(channels, ends)])
+        expanded = dcel.expansions / len(ends) if name != 'bfs' else float('nan')
+        results[name] = (np.mean([len(c) for c in channels]), np.array(lengths), expanded,
+                         1e3 * seconds / len(ends), 1e3 * funnel_seconds / len(ends))
+    if not np.allclose(costs['alt'], costs['astar'], rtol=1e-9, atol=0.0):
+        worst = np.max(costs['alt'] / costs['astar'])
+        raise RuntimeError(f"alt found costlier channels than astar, up to {worst:.4f} times the cost.")
+    return results, prep
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapefile', default='data/map.shp')
+    parser.add_argument('--records', type=int, default=3, help="largest records of the shapefile to use")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[3000, 10000])
+    parser.add_argument('--pairs', type=int, default=200)
+    parser.add_argument('--landmarks', type=int, default=16)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    inputs = [(f'record {i}', polygon) for i, polygon in
+              sorted(enumerate(load_shapes(args.shapefile)), key=lambda item: -item[1].n)[:args.records]]
+    for n in args.sizes:
+        inputs += [(f'star {n}', star_polygon(n)), (f'comb {n}', comb_polygon(n)),
+                   (f'holes {n}', perforated_polygon(n)), (f'bump {n}', bump_polygon(n))]
+
+    print(f"{'input':>12} {'search':>7} {'channel':>8} {'path':>6} {'expanded':>9} {'search [ms]':>12} "
+          f"{'funnel [ms]':>12} {'prep [s]':>9}")
+    for name, polygon in inputs:
+        points = interior_points(polygon, 2 * args.pairs, rng)
+        results, prep = measure(polygon, list(zip(points[::2], points[1::2])), args.landmarks)
+        reference = results['bfs'][1]
+        for search, (channel, lengths, expanded, ms, funnel_ms) in results.items():
+            seconds = f'{prep:.2f}' if search == 'alt' else '-'
+            print(f"{name:>12} {search:>7} {channel:>8.1f} {np.mean(lengths / reference):>6.3f} {expanded:>9.1f} "
+                  f"{ms:>12.3f} {funnel_ms:>12.3f} {seconds:>9}")
+
+
+if __name__ == '__main__':
+    main()
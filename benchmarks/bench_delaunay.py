@@ -0,0 +1,78 @@
+"""Measures what constrained Delaunay refinement does to channels, funnels and queries.
+
+    python -m benchmarks.bench_delaunay --sizes 1000 3000 --pairs 200
+
+Every polygon is triangulated by earcut once as is and once refined with Lawson flips,
+and a SinglePolygonLocator is built on both. The same random pairs of interior points
+are then located and connected. Channel is the mean number of triangles on the channel
+from find_path, funnel steps the mean number of funnel operations on it, locate the mean
+latency of a single locate and path the mean time of a whole get_shortest_path.
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.common import comb_polygon, load_shapes, star_polygon, timed
+from lib.point_location.geo.shapes import Point, Polygon
+from lib.point_location.kirkpatrick import SinglePolygonLocator
+
+
+def interior_points(polygon: Polygon, count: int, rng: np.random.Generator) -> list[Point]:
+    x0, y0, x1, y1 = polygon.prepared.bbox
+    points = []
+    while len(points) < count:
+        xy = np.column_stack((rng.uniform(x0, x1, 4 * count), rng.uniform(y0, y1, 4 * count)))
+        points += [Point(x, y) for x, y in xy[polygon.prepared.contains_points(xy)].tolist()]
+    return points[:count]
+
+
+def measure(polygon: Polygon, delaunay: bool, pairs: list[tuple[Point, Point]]):
+    outline = Polygon(polygon.points)
+    triangles = outline.triangulate_polygon(delaunay=delaunay)
+    locator = SinglePolygonLocator(triangles, outline)
+
+    channel = 0
+    found = []
+    _, locate_time = timed(lambda: [found.append((locator.locate(p), locator.locate(q))) for p, q in pairs])
+    path_time = 0.0
+    for (p, q), (tp, tq) in zip(pairs, found):
+        channel += len(locator.find_path(tp, tq))
+        locator.set_first_point(p)
+        _, seconds = timed(locator.get_shortest_path, q)
+        path_time += seconds
+    # Counted in a second pass, so that the hook does not weigh on the timing above.
+    operations = []
+    locator.dcel.trace = lambda operation, portal: operations.append(operation)
+    for p, q in pairs:
+        locator.set_first_point(p)
+        locator.get_shortest_path(q)
+    steps = len(operations)
+    n = len(pairs)
+    return channel / n, steps / n, 1e6 * locate_time / (2 * n), 1e3 * path_time / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapefile', default='data/map.shp')
+    parser.add_argument('--records', type=int, default=3, help="largest records of the shapefile to use")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 3000])
+    parser.add_argument('--pairs', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    inputs = [(f'record {i}', polygon) for i, polygon in
+              sorted(enumerate(load_shapes(args.shapefile)), key=lambda item: -item[1].n)[:args.records]]
+    for n in args.sizes:
+        inputs += [(f'star {n}', star_polygon(n)), (f'comb {n}', comb_polygon(n))]
+
+    print(f"{'input':>12} {'refined':>8} {'channel':>8} {'funnel steps':>13} {'locate [us]':>12} {'path [ms]':>10}")
+    for name, polygon in inputs:
+        points = interior_points(polygon, 2 * args.pairs, rng)
+        pairs = list(zip(points[::2], points[1::2]))
+        for delaunay in (False, True):
+            channel, steps, locate, path = measure(polygon, delaunay, pairs)
+            print(f"{name:>12} {str(delaunay):>8} {channel:>8.1f} {steps:>13.1f} {locate:>12.1f} {path:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
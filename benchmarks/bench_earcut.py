@@ -0,0 +1,49 @@
+"""Compares the Node based earcut with the index array port on map.shp and large star polygons.
+
+    python -m benchmarks.bench_earcut --sizes 3000 10000 30000
+
+For every input it reports the triangulation time and, from a separate run, the peak
+memory traced by tracemalloc for both implementations, and checks that they return the
+same triangles. The map.shp row sums over all records, most of which are small rings.
+"""
+import argparse
+import tracemalloc
+
+from benchmarks.common import load_shapes, star_polygon, timed
+from lib.triangulation import earcut, earcut_array
+
+
+IMPLEMENTATIONS = (('nodes', earcut.earcut), ('arrays', earcut_array.earcut))
+
+
+def measure(fn, rings):
+    # tracemalloc slows allocation heavy code down a lot, so time and memory are two runs.
+    result, seconds = timed(lambda: [fn(xy) for xy in rings])
+    tracemalloc.start()
+    for xy in rings:
+        fn(xy)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapefile', default='data/map.shp')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[3000, 10000, 30000])
+    args = parser.parse_args()
+
+    inputs = [(args.shapefile, [polygon.xy for polygon in load_shapes(args.shapefile)])]
+    inputs += [(f'star {n}', [star_polygon(n).xy]) for n in args.sizes]
+
+    print(f"{'input':>16} {'impl':>7} {'time [s]':>9} {'peak [MiB]':>11} {'same':>5}")
+    for name, rings in inputs:
+        reference = None
+        for impl, fn in IMPLEMENTATIONS:
+            triangles, seconds, peak = measure(fn, rings)
+            reference = triangles if reference is None else reference
+            print(f"{name:>16} {impl:>7} {seconds:>9.3f} {peak / 2 ** 20:>11.2f} {str(triangles == reference):>5}")
+
+
+if __name__ == '__main__':
+    main()
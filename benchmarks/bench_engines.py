@@ -0,0 +1,61 @@
+"""Compares the Kirkpatrick and trapezoidal map point location engines on the shapefiles in data/.
+
+    python -m benchmarks.bench_engines --limit 50 --queries 2000
+
+For every file and engine it reports the build time, the memory the built locator keeps
+(measured with tracemalloc), the mean latency of a single locate and the time per point
+of a locate_many batch. Triangulation happens once, before any engine is timed.
+"""
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.common import load_shapes, timed
+from lib.point_location.geo.shapes import Point
+from lib.point_location.kirkpatrick import MultiPolygonLocator
+
+
+ENGINES = ('kirkpatrick', 'trapezoid')
+
+
+def build(polygons, engine: str):
+    tracemalloc.start()
+    locator = MultiPolygonLocator(engine=engine)
+    _, seconds = timed(locator.add_regions, polygons)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return locator, seconds, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', default=['data/forma.shp', 'data/forma2.shp', 'data/map.shp'])
+    parser.add_argument('--limit', type=int, default=50, help="records to load from each file")
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'file':>18} {'engine':>12} {'build [s]':>10} {'memory [KiB]':>13} "
+          f"{'locate [us]':>12} {'batch [us/pt]':>14}")
+    for path in args.files:
+        polygons = load_shapes(path)[:args.limit]
+        for polygon in polygons:
+            polygon.triangulation
+
+        xs = [p.x for polygon in polygons for p in polygon.points]
+        ys = [p.y for polygon in polygons for p in polygon.points]
+        xy = np.column_stack((rng.uniform(min(xs), max(xs), args.queries),
+                              rng.uniform(min(ys), max(ys), args.queries)))
+        points = [Point(x, y) for x, y in xy.tolist()]
+
+        for engine in ENGINES:
+            locator, build_time, memory = build(polygons, engine)
+            _, single = timed(lambda: [locator.locate(p) for p in points])
+            _, batch = timed(locator.locate_many, xy)
+            print(f"{path:>18} {engine:>12} {build_time:>10.3f} {memory / 1024:>13.1f} "
+                  f"{1e6 * single / len(points):>12.1f} {1e6 * batch / len(points):>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
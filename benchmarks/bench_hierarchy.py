@@ -0,0 +1,48 @@
+"""Compares the Kirkpatrick hierarchy builders on random star-shaped polygons.
+
+    python -m benchmarks.bench_hierarchy --sizes 1000 10000 100000 --graph-max 30000
+
+Both builders get the same triangulation and the same bounding triangle, whose
+boundary triangles (earcut of the space between it and the polygon) are computed once
+and reported as boundary. Incremental times HierarchyBuilder.build alone. The graph
+builder is not separable from SinglePolygonLocator, so graph is its whole locator
+construction less the time the incremental locator spends outside HierarchyBuilder.build
+(bounding triangle, boundary and DCEL); speedup is graph over incremental.
+"""
+import argparse
+
+from benchmarks.common import star_polygon, timed
+from lib.point_location import min_triangle
+from lib.point_location.hierarchy import HierarchyBuilder
+from lib.point_location.kirkpatrick import SinglePolygonLocator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 3000, 10000, 30000, 100000])
+    parser.add_argument('--graph-max', type=int, default=30000,
+                        help="largest polygon to run the graph builder on")
+    args = parser.parse_args()
+
+    print(f"{'vertices':>10} {'earcut [s]':>11} {'boundary [s]':>13} {'incremental [s]':>16} "
+          f"{'graph [s]':>10} {'speedup':>8}")
+    for n in args.sizes:
+        polygon = star_polygon(n)
+        triangulation, earcut_time = timed(lambda: polygon.triangulation)
+        bounding_triangle = min_triangle.larger_bounding_triangle(polygon.points)
+        boundary, boundary_time = timed(bounding_triangle.triangulate_polygon, [polygon.points])
+
+        _, incremental = timed(HierarchyBuilder().build, triangulation, boundary, bounding_triangle.points)
+        if n <= args.graph_max:
+            _, locator = timed(SinglePolygonLocator, triangulation, polygon, 'incremental')
+            _, graph = timed(SinglePolygonLocator, triangulation, polygon, 'graph')
+            graph -= locator - incremental
+            print(f"{n:>10} {earcut_time:>11.3f} {boundary_time:>13.3f} {incremental:>16.3f} "
+                  f"{graph:>10.3f} {graph / incremental:>8.2f}")
+        else:
+            print(f"{n:>10} {earcut_time:>11.3f} {boundary_time:>13.3f} {incremental:>16.3f} "
+                  f"{'-':>10} {'-':>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Compares the earcut and monotone triangulation engines on map.shp and on hard synthetic polygons.
+
+    python -m benchmarks.bench_triangulation --sizes 1000 3000 10000 30000 --earcut-max 3000
+
+Star polygons are random and mostly concave; comb polygons have teeth from the top
+and the bottom, so about half of their vertices are split or merge vertices, which
+drives earcut towards quadratic time. Earcut is skipped on synthetic polygons above
+--earcut-max vertices. The last column checks that both engines cover the same area.
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.common import comb_polygon, load_shapes, star_polygon, timed
+from lib.triangulation.batch import triangulate
+
+
+def covered_area(xy: np.ndarray, triangles: np.ndarray) -> float:
+    a, b, c = xy[triangles[:, 0]], xy[triangles[:, 1]], xy[triangles[:, 2]]
+    return float(np.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])).sum() / 2)
+
+
+def run(rings: list[np.ndarray], engine: str):
+    triangles, seconds = timed(lambda: [triangulate(xy, engine=engine) for xy in rings])
+    return seconds, sum(covered_area(xy, t) for xy, t in zip(rings, triangles))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapefile', default='data/map.shp')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 3000, 10000, 30000])
+    parser.add_argument('--earcut-max', type=int, default=3000,
+                        help="largest synthetic polygon to run earcut on")
+    args = parser.parse_args()
+
+    inputs = [(args.shapefile, [polygon.xy for polygon in load_shapes(args.shapefile)], True)]
+    for n in args.sizes:
+        inputs.append((f'star {n}', [star_polygon(n).xy], n <= args.earcut_max))
+        inputs.append((f'comb {n}', [comb_polygon(n).xy], n <= args.earcut_max))
+
+    print(f"{'input':>16} {'earcut [s]':>11} {'monotone [s]':>13} {'speedup':>8} {'same area':>10}")
+    for name, rings, with_earcut in inputs:
+        monotone_time, monotone_area = run(rings, 'monotone')
+        if not with_earcut:
+            print(f"{name:>16} {'-':>11} {monotone_time:>13.3f} {'-':>8} {'-':>10}")
+            continue
+        earcut_time, earcut_area = run(rings, 'earcut')
+        same = abs(earcut_area - monotone_area) <= 1e-9 * max(earcut_area, 1.0)
+        print(f"{name:>16} {earcut_time:>11.3f} {monotone_time:>13.3f} {earcut_time / monotone_time:>8.1f} {str(same):>10}")
+
+
+if __name__ == '__main__':
+    main()
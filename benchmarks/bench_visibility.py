@@ -0,0 +1,74 @@
+"""Compares the path strategies of SinglePolygonLocator: funnel and visibility.
+
+    python -m benchmarks.bench_visibility --sizes 1000 3000 --pairs 200
+
+For random pairs of interior points, get_shortest_path is timed with both strategies
+on the same locator, point location included. Reflex and edges give the size of the
+visibility graph, pairwise whether it keeps the distances between all reflex vertices,
+and prep the time to build it, which the first visibility query would otherwise pay.
+Path is the mean length of the visibility path relative to the funnel path, well
+below 1 with holes, where the funnel only sees the channel A* picked.
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.bench_delaunay import interior_points
+from benchmarks.common import comb_polygon, load_shapes, perforated_polygon, star_polygon, timed
+from lib.point_location.geo.shapes import Polygon
+from lib.point_location.kirkpatrick import SinglePolygonLocator
+
+
+def path_length(result: tuple[np.ndarray, np.ndarray]) -> float:
+    return float(np.hypot(*np.diff(result[1], axis=0).T).sum())
+
+
+def measure(polygon: Polygon, pairs: list):
+    locator = SinglePolygonLocator(polygon.triangulation, polygon)
+    # The lists astar searches are built once per mesh, outside of the timing.
+    locator.dcel._search_graph()
+    graph, prep = timed(lambda: locator.visibility_graph)
+
+    def paths(strategy: str) -> list:
+        locator.path_strategy = strategy
+        results = []
+        for p, q in pairs:
+            locator.set_first_point(p)
+            results.append(locator.get_shortest_path(q))
+        return results
+
+    funnel, funnel_seconds = timed(paths, 'funnel')
+    visibility, visibility_seconds = timed(paths, 'visibility')
+    ratio = np.mean([path_length(v) / path_length(f) for f, v in zip(funnel, visibility)
+                     if f is not None and v is not None])
+    return (len(graph.reflex), len(graph.targets) // 2, graph.distances is not None, prep, ratio,
+            1e3 * funnel_seconds / len(pairs), 1e3 * visibility_seconds / len(pairs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapefile', default='data/map.shp')
+    parser.add_argument('--records', type=int, default=3, help="largest records of the shapefile to use")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 3000])
+    parser.add_argument('--pairs', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    inputs = [(f'record {i}', polygon) for i, polygon in
+              sorted(enumerate(load_shapes(args.shapefile)), key=lambda item: -item[1].n)[:args.records]]
+    for n in args.sizes:
+        inputs += [(f'star {n}', star_polygon(n)), (f'comb {n}', comb_polygon(n)),
+                   (f'holes {n}', perforated_polygon(n))]
+
+    print(f"{'input':>12} {'reflex':>7} {'edges':>7} {'pairwise':>9} {'prep [s]':>9} {'path':>6} "
+          f"{'funnel [ms]':>12} {'visibility [ms]':>16}")
+    for name, polygon in inputs:
+        points = interior_points(polygon, 2 * args.pairs, rng)
+        reflex, edges, pairwise, prep, ratio, funnel_ms, visibility_ms = measure(
+            polygon, list(zip(points[::2], points[1::2])))
+        print(f"{name:>12} {reflex:>7} {edges:>7} {'yes' if pairwise else 'no':>9} {prep:>9.2f} {ratio:>6.3f} "
+              f"{funnel_ms:>12.3f} {visibility_ms:>16.3f}")
+
+
+if __name__ == '__main__':
+    main()
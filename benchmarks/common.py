@@ -0,0 +1,75 @@
+import time
+from math import cos, sin, pi
+from random import Random
+
+from lib.point_location.geo.shapes import Point, Polygon, polygons_from_parts
+
+
+def star_polygon(n: int, seed: int = 0, radius: float = 1000.0) -> Polygon:
+    """Returns a random simple, star-shaped (and generally concave) polygon with n vertices."""
+    rng = Random(seed)
+    angles = sorted(rng.random() * 2 * pi for _ in range(n))
+    radii = [radius * (0.5 + 0.5 * rng.random()) for _ in range(n)]
+    return Polygon([Point(r * cos(a), r * sin(a)) for a, r in zip(angles, radii)])
+
+
+def comb_polygon(n: int, seed: int = 0) -> Polygon:
+    """Returns a simple polygon with about n vertices whose teeth hang down from the top and rise from the bottom.
+
+    Every tooth tip is a split or a merge vertex, so about half of all vertices are reflex.
+    """
+    rng = Random(seed)
+    teeth = max(1, n // 6)
+    bottom = [Point(0.0, 0.0)]
+    top = []
+    for i in range(teeth):
+        bottom += [Point(i + 0.1, 0.0), Point(i + 0.2, 0.5 + 0.4 * rng.random()), Point(i + 0.3, 0.0)]
+        top += [Point(i + 0.6, 1.0), Point(i + 0.7, 0.5 - 0.4 * rng.random()), Point(i + 0.8, 1.0)]
+    return Polygon(bottom + [Point(teeth, 0.0), Point(teeth, 1.0)] + top[::-1] + [Point(0.0, 1.0)])
+
+
+def bump_polygon(n: int, amplitude: float = 20.0, width: float = 3.0) -> Polygon:
+    """Returns a long strip with n vertices that follows one period of a sine wave.
+
+    Both sides have small alternating bumps, so the channel between the two ends is a
+    single long, gently curving corridor whose funnel chains grow long before they bend.
+    """
+    m = max(2, n // 2)
+    center = [amplitude * sin(2 * pi * i / m) for i in range(m)]
+    bottom = [Point(i, y + 0.1 * width * (i % 2)) for i, y in enumerate(center)]
+    top = [Point(i, y + width - 0.1 * width * (i % 2)) for i, y in enumerate(center)]
+    return Polygon(bottom + top[::-1])
+
+
+def perforated_polygon(n: int, seed: int = 0) -> Polygon:
+    """Returns a square with about n vertices, nearly all of them on a grid of small random quadrilateral holes.
+
+    Unlike a simple polygon, whose triangles form a tree, there are many channels
+    between two points, which makes it the input for comparing channel searches.
+    """
+    rng = Random(seed)
+    k = max(1, int((n / 4) ** 0.5))
+    holes = []
+    for i in range(k):
+        for j in range(k):
+            x, y = i + 0.5 + 0.2 * (rng.random() - 0.5), j + 0.5 + 0.2 * (rng.random() - 0.5)
+            r = [0.15 + 0.2 * rng.random() for _ in range(4)]
+            holes.append([Point(x - r[0], y), Point(x, y - r[1]), Point(x + r[2], y), Point(x, y + r[3])])
+    return Polygon([Point(0.0, 0.0), Point(k, 0.0), Point(k, k), Point(0.0, k)], holes)
+
+
+def load_shapes(path: str) -> list[Polygon]:
+    """Reads the polygons of every record of a shapefile, holes included, like main.py does."""
+    import shapefile
+
+    with shapefile.Reader(path) as reader:
+        shapes = reader.shapes()
+    return [polygon for shape in shapes if len(shape.points) > 3
+            for polygon in polygons_from_parts(shape.points, shape.parts)]
+
+
+def timed(fn, *args, **kwargs):
+    """Calls fn and returns its result together with the elapsed wall time in seconds."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
@@ -0,0 +1,176 @@
+from array import array
+from math import hypot
+from typing import Optional
+
+import numpy as np
+
+from lib.path_finding.path_tools import DCEL
+from lib.point_location.geo.shapes import Point
+
+
+def _orient(a: tuple[float, float], b: tuple[float, float], c: tuple[float, float]) -> float:
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+class ShortestPathMap:
+    """Shortest paths from one source point to any point of a triangulation.
+
+    The channels from the source triangle to all other triangles form a tree of edge
+    crossings, see DCEL.channel_tree; for a polygon without holes it is the dual of the
+    triangulation itself. The funnel is swept down that tree once: every crossing keeps
+    the funnel of its portal, as an apex and a left and a right chain that start at the
+    apex. The path to a point then only needs the funnels of the crossings into its
+    triangle, see path_to.
+
+    Funnels share their corners as nodes, each linked to the corner before it on the
+    shortest path from the source, so the links form the shortest path tree and every
+    node knows its path length. A chain is then just its last node, whose links lead
+    back to the apex, and a crossing adds a single node, the new end of its portal.
+    Nodes also carry skew-binary jump pointers, which reach any corner of a chain in
+    O(log n) steps; the chains are convex, so the corners a new end cuts off are found
+    by binary search. The sweep takes O(n log^2 n) time and O(n) memory.
+    """
+
+    def __init__(self, dcel: DCEL, source: int, source_point: Point):
+        self.dcel = dcel
+        self.source = source
+        self.source_point = source_point
+        triangles = dcel.triangles
+        self._corners = [[(p.x, p.y) for p in t.points] for t in triangles]
+        self._ccw = [_orient(*corners) > 0 for corners in self._corners]
+
+        # Funnel corners: position, previous corner on the path, depth, jump pointer and
+        # path length. Node 0 is the source.
+        self._xy: list[tuple[float, float]] = []
+        self._pred = array('i')
+        self._depth = array('i')
+        self._jump = array('i')
+        self._length = array('d')
+        root = self._node((source_point.x, source_point.y), -1)
+        # Per crossing: the last node of the left and of the right chain and the apex;
+        # -1 for crossings not reached.
+        self._funnels = array('i', [-1]) * (3 * 3 * len(triangles))
+        # The reached crossings into every triangle.
+        self._into: list[list[int]] = [[] for _ in triangles]
+
+        entered = dcel.neighbors.ravel().tolist()
+        order, parent = dcel.channel_tree(source, source_point)
+        funnels = self._funnels
+        for c in order:
+            self._into[entered[c]].append(c)
+            left, right = self._portal(c)
+            if (p := parent[c]) < 0:
+                funnels[3 * c:3 * c + 3] = array('i', (self._node(left, root), self._node(right, root), root))
+                continue
+            funnel = funnels[3 * p:3 * p + 3]
+            # Consecutive portals share one endpoint; the other one is new.
+            on_right = left == self._xy[funnel[0]]
+            v = right if on_right else left
+            funnel = self._tighten(funnel, v, on_right)
+            side = 1 if on_right else 0
+            funnel[side] = self._node(v, funnel[side])
+            funnels[3 * c:3 * c + 3] = funnel
+        return
+
+    def _portal(self, c: int) -> tuple[tuple[float, float], tuple[float, float]]:
+        """Returns the left and the right end of the edge of crossing C, as seen when crossing."""
+        t, i = divmod(c, 3)
+        corners = self._corners[t]
+        a, b = corners[i], corners[(i + 1) % 3]
+        return (b, a) if self._ccw[t] else (a, b)
+
+    def _node(self, xy: tuple[float, float], pred: int) -> int:
+        """Adds a node at XY whose path runs over PRED, -1 for none, and returns it."""
+        node = len(self._xy)
+        self._xy.append(xy)
+        self._pred.append(pred)
+        if pred < 0:
+            self._depth.append(0)
+            self._jump.append(node)
+            self._length.append(0.0)
+            return node
+        depth, jump = self._depth, self._jump
+        depth.append(depth[pred] + 1)
+        j = jump[pred]
+        jump.append(jump[j] if depth[pred] - depth[j] == depth[j] - depth[jump[j]] else pred)
+        a = self._xy[pred]
+        self._length.append(self._length[pred] + hypot(xy[0] - a[0], xy[1] - a[1]))
+        return node
+
+    def _ancestor(self, node: int, depth: int) -> int:
+        """Returns the node at DEPTH on the path to NODE."""
+        while self._depth[node] > depth:
+            j = self._jump[node]
+            node = j if self._depth[j] >= depth else self._pred[node]
+        return node
+
+    def _tighten(self, funnel, v: tuple[float, float], on_right: bool):
+        """Makes room for V on the given side of FUNNEL, its left end, right end and apex.
+
+        Returns the funnel without the corners that the straight line to V no longer bends
+        around; V goes after the end of its side. If V lies beyond the other chain, the
+        apex moves along that chain and the side of V is left with the new apex alone.
+        """
+        xy, pred, depth = self._xy, self._pred, self._depth
+        end, other, apex = (funnel[1], funnel[0], funnel[2]) if on_right else (funnel[0], funnel[1], funnel[2])
+        sign = 1.0 if on_right else -1.0
+        first = depth[apex]
+
+        # The corners of a chain turn one way, so the ones to cut off form a suffix of it:
+        # those whose edge from the corner before has V on its outer side.
+        lo, hi = first + 1, depth[end] + 1
+        while lo < hi:
+            node = self._ancestor(end, mid := (lo + hi) // 2)
+            if sign * _orient(xy[pred[node]], xy[node], v) >= 0:
+                hi = mid
+            else:
+                lo = mid + 1
+        end = self._ancestor(end, lo - 1)
+
+        if end == apex:
+            # The path to V bends around the corners of the other chain that V lies
+            # beyond, a prefix of it; the last of them becomes the apex.
+            lo, hi = first + 1, depth[other] + 1
+            while lo < hi:
+                node = self._ancestor(other, mid := (lo + hi) // 2)
+                if sign * _orient(xy[pred[node]], xy[node], v) > 0:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            end = apex = self._ancestor(other, lo - 1)
+        return array('i', (other, end, apex) if on_right else (end, other, apex))
+
+    def _path(self, node: int) -> list[tuple[float, float]]:
+        """Returns the corners of the path from the source to NODE."""
+        corners = []
+        while node >= 0:
+            corners.append(self._xy[node])
+            node = self._pred[node]
+        return corners[::-1]
+
+    def reaches(self, triangle: int) -> bool:
+        return triangle == self.source or bool(self._into[triangle])
+
+    def _path_through(self, c: int, end: tuple[float, float]) -> tuple[int, float]:
+        """Returns the node END is seen from over crossing C and the length of the path to END."""
+        # END closes the funnel like the far corner of one more triangle would.
+        node = self._tighten(self._funnels[3 * c:3 * c + 3], end, True)[1]
+        x, y = self._xy[node]
+        return node, self._length[node] + hypot(end[0] - x, end[1] - y)
+
+    def path_to(self, triangle: int, point: Point) -> Optional[tuple[np.ndarray, float]]:
+        """Returns the shortest path to POINT in TRIANGLE as an (M, 2) array, and its length.
+
+        Of the channels over the crossings into TRIANGLE, the one with the shortest path is
+        taken. None if the triangle is not connected to the source.
+        """
+        end = (point.x, point.y)
+        if triangle == self.source:
+            x, y = self._xy[0]
+            node, length = 0, hypot(end[0] - x, end[1] - y)
+        elif not self._into[triangle]:
+            return None
+        else:
+            node, length = min((self._path_through(c, end) for c in self._into[triangle]),
+                               key=lambda through: through[1])
+        return np.array(self._path(node) + [end], dtype=np.float64).reshape(-1, 2), length
@@ -1,14 +1,13 @@
+from array import array
 from collections import deque
-from dataclasses import dataclass
-from typing import Optional, Iterable
+from heapq import heappop, heappush
+from math import hypot, inf
+from random import random
+from typing import Callable, Optional, Iterable
 
-from lib.point_location.geo.shapes import Point, Triangle
-from lib.point_location.geo.shapes import ccw
+import numpy as np
 
-
-def point_pair_hash(p1: Point, p2: Point):
-   
-    return hash(hash(p1) + hash(p2))
+from lib.point_location.geo.shapes import Point, Triangle, triangle_contains
 
 
 def retrieve_path(graph: dict[int, Optional[int]], s: int) -> list[int]:
@@ -26,248 +25,442 @@ def retrieve_path(graph: dict[int, Optional[int]], s: int) -> list[int]:
         node = graph[node]
 
 
-def find_common_element(l1: Iterable, l2: Iterable):
-   
-    for i in l1:
-        for j in l2:
-            if i == j:
-                return i
-    return None
-
-
-@dataclass()
-class TriangleInfo:
-    triangle: Triangle
-    edges: set[int]
-    neighbors: set[int]
-    pass
+def funnel_path(xy: np.ndarray, portals: np.ndarray, start: tuple[float, float], end: tuple[float, float],
+                trace: Callable[[str, int], None] = None) -> np.ndarray:
+    """Returns the shortest path from START to END through PORTALS as an (M, 2) array.
+
+    PORTALS is the (K, 2) array of the left and the right vertex id of every edge the
+    channel crosses, see DCEL.portals, and XY the coordinates those ids address. The
+    funnel is kept as a left and a right chain, deques of indices that both start at the
+    apex. Every portal adds its new end to its side: the corners that the straight line
+    to it no longer bends around are popped from the far end of that chain, and if only
+    the apex is left, the apex moves along the other chain past the corners the new end
+    lies beyond, which join the path. Every corner is pushed and popped at most once, so
+    the funnel takes linear time. END closes the funnel on the right. TRACE, if given, is
+    called with every operation and the index of its portal, where the start is portal 0
+    and the end portal K + 1.
+    """
+    # Portal k has its ends at 2 * k and 2 * k + 1, the start and the end follow.
+    points = xy[portals].reshape(-1, 2).tolist()
+    points += [list(start), list(end)]
+    source, target = len(points) - 2, len(points) - 1
+    left, right = deque((source,)), deque((source,))
+    path = [points[source]]
+
+    def add(v: int, on_right: bool, k: int):
+        chain, other = (right, left) if on_right else (left, right)
+        side, sign = ('right', 1.0) if on_right else ('left', -1.0)
+        vx, vy = points[v]
+        while len(chain) >= 2:
+            (ax, ay), (bx, by) = points[chain[-2]], points[chain[-1]]
+            if sign * ((bx - ax) * (vy - ay) - (by - ay) * (vx - ax)) < 0:
+                break
+            chain.pop()
+            if trace is not None:
+                trace(f'{side}: popping', k)
+        if len(chain) == 1:
+            while len(other) >= 2:
+                (ax, ay), (bx, by) = points[other[0]], points[other[1]]
+                if sign * ((bx - ax) * (vy - ay) - (by - ay) * (vx - ax)) <= 0:
+                    break
+                other.popleft()
+                path.append(points[other[0]])
+                if trace is not None:
+                    trace(f'{side}: crossing', k)
+            chain[0] = other[0]
+        chain.append(v)
+        if trace is not None:
+            trace(f'{side}: pushing', k)
+
+    # Consecutive portals share one end; only the other one is new.
+    last_left = last_right = -1
+    for k, (p, q) in enumerate(portals.tolist()):
+        if p != last_left:
+            add(2 * k, False, k + 1)
+            last_left = p
+        if q != last_right:
+            add(2 * k + 1, True, k + 1)
+            last_right = q
+    add(target, True, len(portals) + 1)
+    path += [points[v] for v in list(right)[1:]]
+    return np.array(path, dtype=np.float64).reshape(-1, 2)
+
+
+# The number of landmarks that bound the heuristic of a single astar search.
+ACTIVE_LANDMARKS = 4
 
 
 class DCEL:
-    def __init__(self, triangles: Iterable[Triangle]):
-        self.triangles: dict[int, TriangleInfo] = dict()
-        self.edges: dict[int, Edge] = dict()
-        self._create_graph(triangles)
+    """Adjacency of a triangulation, addressed by triangle ids.
+
+    The id of a triangle is its position in TRIANGLES. neighbors[t, i] is the id of the
+    triangle across the edge from point i to point i + 1 of triangle t, or -1 on the
+    boundary. corners[t, i] is the id of point i of triangle t, shared by all triangles
+    at that point, and vertex_xy holds the coordinates of every id.
+
+    NEIGHBORS, CORNERS and VERTEX_XY can be given together, e.g. as arrays mapped from a
+    saved locator, and are then used as they are instead of being rebuilt from TRIANGLES.
+    """
+
+    def __init__(self, triangles: Iterable[Triangle], neighbors: np.ndarray = None, corners: np.ndarray = None,
+                 vertex_xy: np.ndarray = None):
+        self.triangles: list[Triangle] = list(triangles)
+        self._links: Optional[list[list[tuple[int, int, float, float]]]] = None
+        self._entered: Optional[list[int]] = None
+        self._portal_xy: Optional[list[float]] = None
+        # Set by select_landmarks or by a loaded locator, see astar.
+        self.landmarks: Optional[np.ndarray] = None
+        self.landmark_distances: Optional[np.ndarray] = None
+        self.landmark_spans: Optional[np.ndarray] = None
+        # The number of crossings astar has expanded over all searches.
+        self.expansions = 0
+        # Called by funnel with every operation it performs, see funnel_path.
+        self.trace: Optional[Callable[[str, int], None]] = None
+        if neighbors is None:
+            self._create_graph()
+        else:
+            self.neighbors, self.corners, self.vertex_xy = neighbors, corners, vertex_xy
+        a, b, c = (self.vertex_xy[self.corners[:, k]] for k in range(3))
+        self._ccw = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]) > 0
         return
 
-    def _create_graph(self, triangles: Iterable[Triangle]):
-        for t in triangles:
-            edges = set()
-            neighbors = set()
-            this_triangle_hash = hash(t)
+    def _create_graph(self):
+        vertex_ids: dict[Point, int] = {}
+        open_edges: dict[tuple[int, int], tuple[int, int]] = {}
+        neighbors = self.neighbors = np.full((len(self.triangles), 3), -1, dtype=np.int32)
+        corners = []
+        for t, triangle in enumerate(self.triangles):
+            ids = [vertex_ids.setdefault(p, len(vertex_ids)) for p in triangle.points]
+            corners.append(ids)
             for i in range(3):
-                hash_e = point_pair_hash(t.points[i], t.points[(i + 1) % 3])
-                if hash_e not in self.edges.keys():
-                    self.edges[hash_e] = Edge(t.points[i], t.points[(i + 1) % 3], this_triangle_hash)
+                u, v = ids[i], ids[(i + 1) % 3]
+                key = (u, v) if u < v else (v, u)
+                if (other := open_edges.pop(key, None)) is None:
+                    open_edges[key] = (t, i)
                 else:
-                    other_triangle_hash = self.edges[hash_e].add_triangle(t)
-                    neighbors.add(other_triangle_hash)
-                    self.triangles[other_triangle_hash].neighbors.add(this_triangle_hash)
-                edges.add(hash_e)
-            self.triangles[this_triangle_hash] = TriangleInfo(t, edges, neighbors)
+                    neighbors[t, i] = other[0]
+                    neighbors[other] = t
+        self.vertex_xy = np.array([(p.x, p.y) for p in vertex_ids], dtype=np.float64).reshape(-1, 2)
+        self.corners = np.array(corners, dtype=np.int32).reshape(-1, 3)
         return
 
-    def bfs(self, p1_triangle: Triangle, p2_triangle: Triangle) -> list[int]:
-
-        p1_hash = hash(p1_triangle)
-        p2_hash = hash(p2_triangle)
-
-        graph = self.triangles
-        visited = [p1_hash]
-        queue = [p1_hash]
-
-        traversal = {p1_hash: None}
+    def bfs(self, start: int, goal: int) -> Optional[list[int]]:
+        """Returns the ids of the triangles on a channel from START to GOAL with the fewest triangles."""
+        neighbors = self.neighbors
+        traversal = {start: None}
+        queue = deque((start,))
 
         while queue:
-            s = queue.pop(0)
-  
-            if s == p2_hash:
+            s = queue.popleft()
+
+            if s == goal:
                 return retrieve_path(traversal, s)
 
-            for neighbour in graph[s].neighbors:
-                if neighbour not in visited:
+            for neighbour in neighbors[s].tolist():
+                if neighbour >= 0 and neighbour not in traversal:
                     traversal[neighbour] = s
-                    visited.append(neighbour)
                     queue.append(neighbour)
+        return None
+
+    def _search_graph(self) -> list[list[tuple[int, int, float, float]]]:
+        """Returns the crossings out of every triangle, built on first use.
+
+        The crossing from triangle t over its edge i has the id 3 * t + i; _entered[c] is
+        the triangle crossing c leads into, -1 on the boundary, and _portal_xy[2 * c:2 * c + 2]
+        the midpoint of its edge. _links[t] lists the neighbor, crossing and midpoint of
+        every crossing out of t.
+        """
+        if self._links is None:
+            xy = self.vertex_xy[self.corners]
+            midpoints = (xy + np.roll(xy, -1, axis=1)) / 2
+            self._entered = self.neighbors.ravel().tolist()
+            self._portal_xy = midpoints.ravel().tolist()
+            self._links = [[(u, 3 * t + i, *midpoint) for i, (u, midpoint) in enumerate(zip(neighbors, triangle))
+                            if u >= 0]
+                           for t, (neighbors, triangle) in enumerate(zip(self.neighbors.tolist(), midpoints.tolist()))]
+        return self._links
+
+    def _portal_graph(self) -> tuple[np.ndarray, list[list[tuple[int, float]]], np.ndarray]:
+        """Returns the graph over the shared edges, the portals, that astar moves along.
+
+        Portal ids are given per triangle edge as a (T, 3) array, -1 for boundary edges.
+        Any two portals of a triangle are linked at the distance between their midpoints,
+        and the span of a triangle is the longest such link in it.
+        """
+        links = self._search_graph()
+        t, i = np.nonzero(self.neighbors >= 0)
+        u = self.neighbors[t, i]
+        # The two sides of a portal get the id of the side in the triangle with the lower id.
+        first = t < u
+        ids = np.full(self.neighbors.shape, -1, dtype=np.int64)
+        ids[t[first], i[first]] = np.arange(first.sum())
+        j = np.argmax(self.neighbors[u] == t[:, None], axis=1)
+        ids[t[~first], i[~first]] = ids[u[~first], j[~first]]
+
+        graph = [[] for _ in range(int(first.sum()))]
+        spans = np.zeros(len(links))
+        for triangle, (portals, neighbors) in enumerate(zip(ids.tolist(), links)):
+            portals = [p for p in portals if p >= 0]
+            for a, (_, _, ax, ay) in zip(portals, neighbors):
+                for b, (_, _, bx, by) in zip(portals, neighbors):
+                    if a != b:
+                        graph[a].append((b, d := hypot(ax - bx, ay - by)))
+                        spans[triangle] = max(spans[triangle], d)
+        return ids, graph, spans
+
+    def select_landmarks(self, count: int = 16, seed: int = 0):
+        """Picks COUNT landmark triangles and stores the distance of every triangle to each of them.
+
+        The first landmark is a random triangle, every further one the triangle farthest
+        from those already picked. The distance of a triangle is that of its nearest
+        portal, measured along the portal graph astar moves in, so by the triangle
+        inequality their differences bound the cost left to an astar search from below,
+        up to the span of a triangle (landmark_spans). Row k of the (K, T) float32 matrix
+        landmark_distances holds the distances to landmark k, whose id is landmarks[k].
+        """
+        n = len(self.triangles)
+        count = min(count, n)
+        ids, graph, spans = self._portal_graph()
+        rng = np.random.default_rng(seed)
+        landmarks = [int(rng.integers(n))] if count > 0 else []
+        distances = []
+        nearest = np.full(n, inf)
+        while landmarks:
+            sources = [p for p in ids[landmarks[-1]].tolist() if p >= 0]
+            to_portals = np.append(self._dijkstra(graph, sources), inf)
+            d = to_portals[ids].min(axis=1)
+            d[landmarks[-1]] = 0.0
+            distances.append(d)
+            nearest = np.minimum(nearest, d)
+            if len(landmarks) == count:
+                break
+            # Triangles cut off from all landmarks so far come first.
+            landmarks.append(int(np.argmax(np.where(np.isinf(nearest), np.finfo(np.float64).max, nearest))))
+        self.landmarks = np.array(landmarks, dtype=np.int32)
+        self.landmark_distances = np.array(distances, dtype=np.float32).reshape(len(landmarks), n)
+        self.landmark_spans = spans.astype(np.float32)
+        return
 
-    def presentable_form(self, triangle_hashes: list[int]):
+    @staticmethod
+    def _dijkstra(graph: list[list[tuple[int, float]]], sources: list[int]) -> np.ndarray:
+        """Returns the distance of every node of GRAPH from the nearest of SOURCES, inf where unreachable."""
+        distance = array('d', [inf]) * len(graph)
+        heap = []
+        for source in sources:
+            distance[source] = 0.0
+            heap.append((0.0, source))
+        while heap:
+            d, t = heappop(heap)
+            if d > distance[t]:
+                continue
+            for u, w in graph[t]:
+                if (c := d + w) < distance[u]:
+                    distance[u] = c
+                    heappush(heap, (c, u))
+        return np.frombuffer(distance, dtype=np.float64).copy()
+
+    def astar(self, start: int, goal: int, start_point: Point = None, goal_point: Point = None) -> Optional[list[int]]:
+        """Returns the ids of the triangles on a short channel from START to GOAL.
+
+        A* over the crossings between triangles, see _search_graph: the path runs from
+        START_POINT through the midpoints of the crossed edges to GOAL_POINT, both of which
+        default to the centroids of their triangles, and its length is the cost. The
+        heuristic is the distance from a midpoint to GOAL_POINT. Unlike bfs, the channel is
+        short in length rather than in number of triangles, and the search expands the
+        crossings towards the goal first. A triangle can be entered by up to three of its
+        edges, and each of them is a search state of its own, since the cost of leaving
+        the triangle depends on where it was entered.
+
+        After select_landmarks, the heuristic is raised to the landmark bounds of the
+        ACTIVE_LANDMARKS landmarks that bound the distance from START best, which steers
+        the search around holes that the straight line ignores. The channel costs the
+        same either way: the bounds never overestimate, and crossings reached again more
+        cheaply are reopened.
+        """
+        if start == goal:
+            return [start]
+        links = self._search_graph()
+        entered, portal_xy = self._entered, self._portal_xy
+        if (bounds := self._active_landmarks(start, goal)) is None:
+            return None
+        if bounds:
+            spans = memoryview(self.landmark_spans)
+            goal_span = spans[goal]
+        if start_point is None:
+            start_point = self.triangles[start].centroid()
+        if goal_point is None:
+            goal_point = self.triangles[goal].centroid()
+        sx, sy, gx, gy = start_point.x, start_point.y, goal_point.x, goal_point.y
+
+        n = len(entered)
+        cost = array('d', [inf]) * n
+        parent = array('i', [-1]) * n
+        closed = bytearray(n)
+
+        def estimate(u: int, mx: float, my: float) -> float:
+            h = hypot(gx - mx, gy - my)
+            for row, at_goal in bounds:
+                if (b := abs(at_goal - row[u]) - max(spans[u], goal_span)) > h:
+                    h = b
+            return h
+
+        heap = []
+        for u, c, mx, my in links[start]:
+            cost[c] = hypot(mx - sx, my - sy)
+            heap.append((cost[c] + estimate(u, mx, my), c))
+        heap.sort()
+        expanded = 0
+        while heap:
+            _, c = heappop(heap)
+            if closed[c]:
+                continue
+            closed[c] = 1
+            expanded += 1
+            if (t := entered[c]) == goal:
+                self.expansions += expanded
+                path = [t]
+                while c >= 0:
+                    path.append(c // 3)
+                    c = parent[c]
+                return path[::-1]
+
+            behind, x, y, g = c // 3, portal_xy[2 * c], portal_xy[2 * c + 1], cost[c]
+            for u, d, mx, my in links[t]:
+                if u == behind:
+                    continue
+                if (e := g + hypot(mx - x, my - y)) < cost[d]:
+                    # The landmark bounds are admissible but not consistent, so an expanded
+                    # crossing can still be reached more cheaply; it is then expanded again.
+                    cost[d] = e
+                    parent[d] = c
+                    closed[d] = 0
+                    heappush(heap, (e + estimate(u, mx, my), d))
+        self.expansions += expanded
+        return None
+
+    def _active_landmarks(self, start: int, goal: int) -> Optional[list[tuple[memoryview, float]]]:
+        """Returns the landmark rows astar bounds with and their entries for GOAL.
+
+        Returns None if a landmark shows that START and GOAL are not connected.
+        """
+        if self.landmark_distances is None or not len(self.landmarks):
+            return []
+        at_start = self.landmark_distances[:, start].astype(np.float64)
+        at_goal = self.landmark_distances[:, goal].astype(np.float64)
+        if (np.isinf(at_start) != np.isinf(at_goal)).any():
+            return None
+        reached = np.flatnonzero(np.isfinite(at_start))
+        best = reached[np.argsort(-np.abs(at_goal[reached] - at_start[reached]), kind='stable')[:ACTIVE_LANDMARKS]]
+        return [(memoryview(self.landmark_distances[k]), at_goal[k].item()) for k in best.tolist()]
+
+    def channel_tree(self, start: int, start_point: Point = None) -> tuple[list[int], array]:
+        """Returns the channels astar would find from START to every triangle, as a tree of crossings.
+
+        A Dijkstra search in the cost model of astar over the whole triangulation, see
+        _search_graph. Returns the crossings it reaches in the order they were settled, so
+        every crossing comes after its parent, and the parent of every crossing: -1 for
+        the crossings out of START and for those it does not reach.
+        """
+        links = self._search_graph()
+        entered, portal_xy = self._entered, self._portal_xy
+        if start_point is None:
+            start_point = self.triangles[start].centroid()
+
+        n = len(entered)
+        cost = array('d', [inf]) * n
+        parent = array('i', [-1]) * n
+        closed = bytearray(n)
+
+        heap = []
+        for _, c, mx, my in links[start]:
+            cost[c] = hypot(mx - start_point.x, my - start_point.y)
+            heap.append((cost[c], c))
+        heap.sort()
+        order = []
+        while heap:
+            g, c = heappop(heap)
+            if closed[c]:
+                continue
+            closed[c] = 1
+            order.append(c)
+
+            behind, x, y = c // 3, portal_xy[2 * c], portal_xy[2 * c + 1]
+            for u, d, mx, my in links[entered[c]]:
+                if u == behind or closed[d]:
+                    continue
+                if (e := g + hypot(mx - x, my - y)) < cost[d]:
+                    cost[d] = e
+                    parent[d] = c
+                    heappush(heap, (e, d))
+        return order, parent
+
+    def walk(self, start: int, p: Point, max_steps: int = 64) -> Optional[int]:
+        """Walks from the triangle START towards p, crossing the edge that faces p.
+
+        Returns the id of the triangle containing p, or None if the walk leaves the
+        triangulation or takes more than MAX_STEPS steps. When p lies beyond two edges
+        one of them is picked at random, which keeps the walk from cycling.
+        """
+        def orientation(a: Point, b: Point, c: Point) -> float:
+            return (b.x - a.x) * (c.y - a.y) - (b.y - a.y) * (c.x - a.x)
+
+        if not 0 <= start < len(self.triangles):
+            return None
+
+        t = start
+        previous = -1
+        for _ in range(max_steps):
+            a, b, c = self.triangles[t].points
+            if triangle_contains(((a.x, a.y), (b.x, b.y), (c.x, c.y)), p.x, p.y):
+                return t
+
+            neighbors = self.neighbors[t].tolist()
+            exits = []
+            for i, (u, v, w) in enumerate(((a, b, c), (b, c, a), (c, a, b))):
+                side = orientation(u, v, w)
+                towards_p = orientation(u, v, p)
+                if side == 0 or side * towards_p < 0:
+                    exits.append(neighbors[i])
+
+            # Degenerate triangles have every edge as an exit, don't bounce straight back.
+            if len(exits) == 3:
+                exits = [n for n in exits if n != previous]
+            following = exits[int(random() * len(exits))]
+            if following < 0:
+                return None
+
+            previous, t = t, following
+        return None
+
+    def presentable_form(self, triangle_ids: list[int]):
         triangles = []
-        for h in triangle_hashes:
-            t = self.triangles[h].triangle
+        for t in self.retrieve_triangles(triangle_ids):
             triangles.append({'x': [p.x for p in t.points], 'y': [p.y for p in t.points]})
         return triangles
 
-    def retrieve_triangles(self, triangle_hashes):
-        return [self.triangles[h].triangle for h in triangle_hashes]
-
-    def funnel(self, triangle_hashes: list[int], start: Point, end: Point):
-        
-        edges = []
-        for i in range(len(triangle_hashes) - 1):
-            edge_hash = find_common_element(self.triangles[triangle_hashes[i]].edges,
-                                            self.triangles[triangle_hashes[i + 1]].edges)
-            edges.append(self.edges[edge_hash])
-
-        passthrough_edges = []
-        for e in edges:
-            passthrough_edges.append({'x': [e.p1.x, e.p2.x], 'y': [e.p1.y, e.p2.y]})
-        
-        if not passthrough_edges:
-            return {'x': [start.x, end.x], 'y': [start.y, end.y]}
-
-       
-        pl, pr = edges[0].p1, edges[0].p2
-        if not ccw(pl, start, pr):
-            pl, pr = pr, pl
-
-        prev_edge = edges.pop(0)
-
-        tail = deque((start,))  
-        left = deque((pl,))    
-        right = deque((pr,))    
-
-        def finalize():
-
-            if right and right[0] in tail:
-                queues = [right, left]
-            else:
-                queues = [left, right]
-
-            for q in queues:
-                while q:
-                    item = q.popleft()
-                    if q is left:
-                        if ccw(tail[-1], item, end):
-                            tail.append(item)
-                    else:
-                        if ccw(end, item, tail[-1]):
-                            tail.append(item)
-
-            tail.append(end)
-
-            return {'x': [p.x for p in tail], 'y': [p.y for p in tail]}
-
-        print("\noperation 0")
-
-      
-        for edge in edges:
-
-            
-            last_points = [prev_edge.p1, prev_edge.p2]
-
-
-            if edge.p1 in last_points:
-                bound_point, free_point = edge.p1, edge.p2
-            elif edge.p2 in last_points:
-                bound_point, free_point = edge.p2, edge.p1
-            else:
-                raise ValueError("No common points between 2 consecutive edges.")
-
-            if bound_point == left[-1]:
-                
-
-                if bound_point == tail[-1]:
-                    print("op[right]: tail=left_bound")
-
-           
-                    right.clear()
-                elif right[0] == tail[-1]:
-                    print("op[right]: tail=right_last")
-                    right.popleft()
-                elif not ccw(left[0], tail[-1], free_point):
-                   
-                    print("op[right]: crossing")
-
-       
-                    last_left_point = None
-                    while left and not ccw(left[0], tail[-1], free_point):
-                        last_left_point = left.popleft()
-                        tail.append(last_left_point)
-
-                    if not left and last_left_point is not None:
-                        left.append(last_left_point)
-
-                    
-                    right.clear()
-                elif not ccw(tail[-1], right[-1], free_point):
-             
-                    print("op[right]: widening")
-                else:
-                    
-                    print("op[right]: narrowing")
-
-                 
-                    while right and ccw(tail[-1], right[-1], free_point):
-                        right.pop()
-                    pass
-               
-                right.append(free_point)
-            elif bound_point == right[-1]:
-                
-                if bound_point == tail[-1]:
-                    print("op[left]: tail=right_bound (narrowing)")
-
-                   
-                    left.clear()
-                elif left[0] == tail[-1]:
-                    print("op[left]: tail=left_last")
-                    left.popleft()
-                elif not ccw(free_point, tail[-1], left[0]):
-                  
-                    print("op[left]: crossing")
-
-                    last_right_point = None
-                    while right and not ccw(free_point, tail[-1], right[0]):
-                        last_right_point = right.popleft()
-                        tail.append(last_right_point)
-
-                    if not right and last_right_point is not None:
-                        right.append(last_right_point)
-
-                 
-                    left.clear()
-                elif ccw(tail[-1], left[-1], free_point):
-                   
-                    print("op[left]: widening")
-                else:
-                    
-                    print("op[left]: narrowing")
-
-                  
-                    while left and not ccw(tail[-1], left[-1], free_point):
-                        left.pop()
-                    pass
-
-               
-                left.append(free_point)
-            else:
-                raise ValueError("No common bound point.")
-                pass
-
-           
-            prev_edge = edge
-
-           
-            pass
-
-        return passthrough_edges, finalize()
+    def retrieve_triangles(self, triangle_ids):
+        return [self.triangles[t] for t in triangle_ids]
+
+    def portals(self, triangle_ids: list[int]) -> np.ndarray:
+        """Returns the edges crossed along the channel TRIANGLE_IDS as (K, 2) vertex ids.
+
+        Row k holds the left and the right end of the edge from triangle k into triangle
+        k + 1, as seen when crossing it; the ids address vertex_xy.
+        """
+        channel = np.asarray(triangle_ids, dtype=np.int64)
+        t, u = channel[:-1], channel[1:]
+        i = np.argmax(self.neighbors[t] == u[:, None], axis=1)
+        a, b = self.corners[t, i], self.corners[t, (i + 1) % 3]
+        # Crossing the edge from point i to point i + 1 of a counterclockwise triangle,
+        # point i is on the right.
+        ccw = self._ccw[t]
+        return np.column_stack((np.where(ccw, b, a), np.where(ccw, a, b))).astype(np.int32)
+
+    def funnel(self, triangle_ids: list[int], start: Point, end: Point) -> np.ndarray:
+        """Returns the shortest path from START to END through the channel TRIANGLE_IDS as an (M, 2) array.
+
+        See funnel_path; every operation is reported to the trace hook, if one is set.
+        """
+        return funnel_path(self.vertex_xy, self.portals(triangle_ids), (start.x, start.y), (end.x, end.y),
+                           self.trace)
     pass
-
-
-class Edge:
-    def __init__(self, p1: Point, p2: Point, triangle):
-        self.p1 = p1
-        self.p2 = p2
-        if triangle is None:
-            raise ValueError("Received None")
-        self.triangles = [triangle]
-        return
-
-    def __hash__(self):
-        return point_pair_hash(self.p1, self.p2)
-
-    def add_triangle(self, triangle):
-        if len(self.triangles) > 1:
-            raise IndexError("Attempted to assign a third triangle to an edge")
-        self.triangles.append(triangle)
-        return self.triangles[0]
@@ -0,0 +1,303 @@
+from heapq import heappop, heappush
+from math import hypot, inf, pi
+from typing import Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+
+# Up to this many reflex vertices, the distances between all of them are computed with
+# the graph, and queries only pick the best pair of reflex vertices seen by their ends.
+PAIRWISE_LIMIT = 1000
+
+
+def _orient(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> float:
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+
+class VisibilityGraph:
+    """Exact shortest paths in a triangulated polygon over the visibility graph of its reflex vertices.
+
+    A shortest path only bends at reflex vertices of the boundary, and only where it is
+    tangent to the boundary, so the graph keeps the pairs of reflex vertices that see
+    each other along a line that leaves the boundary on one side at both ends. Edges are
+    stored in CSR arrays: the neighbors of reflex vertex k are targets[offsets[k]:offsets[k + 1]],
+    with the lengths in weights. With at most PAIRWISE_LIMIT reflex vertices, the shortest
+    distances between all of them are kept as well.
+
+    Visibility is decided by walking the triangulation along the segment, which fails at
+    the first boundary edge crossed. Queries connect their ends to the reflex vertices
+    they see and either combine the pairwise distances or search the graph, see shortest_path.
+    """
+
+    def __init__(self, triangle_xy: np.ndarray, neighbors: np.ndarray, pairwise_limit: int = PAIRWISE_LIMIT):
+        """TRIANGLE_XY is the (T, 3, 2) array of the triangle corners and NEIGHBORS the DCEL.neighbors of the triangles."""
+        triangle_xy = np.asarray(triangle_xy, dtype=np.float64).reshape(-1, 3, 2)
+        xy, corners = np.unique(triangle_xy.reshape(-1, 2), axis=0, return_inverse=True)
+        corners = corners.reshape(-1, 3)
+        neighbors = np.asarray(neighbors).reshape(-1, 3)
+        # Counterclockwise corners throughout; swapping corners 1 and 2 reverses the edges,
+        # so edge 0 becomes the old edge 2 and the other way round.
+        a, b, c = (xy[corners[:, k]] for k in range(3))
+        cw = _orient(a[:, 0], a[:, 1], b[:, 0], b[:, 1], c[:, 0], c[:, 1]) < 0
+        corners[cw] = corners[cw][:, [0, 2, 1]]
+        neighbors = np.where(cw[:, None], neighbors[:, [2, 1, 0]], neighbors)
+
+        self._vertex_xy = xy
+        self._xy: list[tuple[float, float]] = [tuple(p) for p in xy.tolist()]
+        self._corners: list[list[int]] = corners.tolist()
+        self._neighbors: list[list[int]] = neighbors.tolist()
+        self._incident: list[list[tuple[int, int]]] = [[] for _ in self._xy]
+        for t, triangle in enumerate(self._corners):
+            for k, v in enumerate(triangle):
+                self._incident[v].append((t, k))
+
+        self.reflex = self._reflex_vertices(xy, corners, neighbors)
+        self._reflex_index = np.full(len(xy), -1, dtype=np.int64)
+        self._reflex_index[self.reflex] = np.arange(len(self.reflex))
+        self.reflex_xy = xy[self.reflex]
+        self._reflex_xy: list[tuple[float, float]] = [tuple(p) for p in self.reflex_xy.tolist()]
+        self.offsets, self.targets, self.weights = self._build_edges()
+        # The CSR arrays as lists of (neighbor, length) pairs, built for the first search.
+        self._adjacent: Optional[list[list[tuple[int, float]]]] = None
+        self.distances: Optional[np.ndarray] = None
+        self.predecessors: Optional[np.ndarray] = None
+        if len(self.reflex) <= pairwise_limit:
+            graph = csr_matrix((self.weights, self.targets, self.offsets), shape=(len(self.reflex),) * 2)
+            self.distances, self.predecessors = dijkstra(graph, directed=False, return_predecessors=True)
+        return
+
+    def _reflex_vertices(self, xy: np.ndarray, corners: np.ndarray, neighbors: np.ndarray) -> np.ndarray:
+        """Returns the reflex boundary vertices and keeps the boundary neighbors of all vertices."""
+        # Interior angles, summed over the triangles around every vertex.
+        angles = np.zeros(len(xy))
+        for k in range(3):
+            u = xy[corners[:, (k + 1) % 3]] - xy[corners[:, k]]
+            v = xy[corners[:, (k + 2) % 3]] - xy[corners[:, k]]
+            np.add.at(angles, corners[:, k], np.arctan2(u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0],
+                                                        (u * v).sum(axis=1)))
+        # The interior lies left of every boundary edge, which runs from corner i to i + 1.
+        t, i = np.nonzero(neighbors < 0)
+        start, end = corners[t, i], corners[t, (i + 1) % 3]
+        self._next = np.full(len(xy), -1, dtype=np.int64)
+        self._previous = np.full(len(xy), -1, dtype=np.int64)
+        self._next[start] = end
+        self._previous[end] = start
+        boundary = self._next >= 0
+        # Straight angles count as reflex, so paths along collinear boundary vertices keep their bends.
+        return np.flatnonzero(boundary & (angles >= pi - 1e-9))
+
+    def _tangent(self, r: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Tests whether the lines from the reflex vertices R to the points (X, Y) keep the boundary on one side at R."""
+        xy = self._vertex_xy
+        rx, ry = xy[r, 0], xy[r, 1]
+        p, n = xy[self._previous[r]], xy[self._next[r]]
+        return _orient(rx, ry, x, y, p[..., 0], p[..., 1]) * _orient(rx, ry, x, y, n[..., 0], n[..., 1]) >= 0
+
+    def _build_edges(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        reflex = self.reflex
+        x, y = self.reflex_xy[:, 0], self.reflex_xy[:, 1]
+        # Pairs whose line is tangent at both ends, each pair once.
+        tangent = self._tangent(reflex[:, None], x[None, :], y[None, :])
+        tangent &= tangent.T
+        visible = np.zeros_like(tangent)
+        for k, v in enumerate(reflex.tolist()):
+            seen = self._reflex_index[list(self._visible_vertices(*self._xy[v], vertex=v))]
+            visible[k, seen[seen >= 0]] = True
+        first, second = np.nonzero(np.triu(tangent & visible, 1))
+
+        sources = np.concatenate((first, second))
+        targets = np.concatenate((second, first))
+        order = np.argsort(sources, kind='stable')
+        sources, targets = sources[order], targets[order].astype(np.int32)
+        weights = np.hypot(x[targets] - x[sources], y[targets] - y[sources])
+        offsets = np.zeros(len(reflex) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources, minlength=len(reflex)), out=offsets[1:])
+        return offsets, targets, weights
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.reflex, self.reflex_xy, self.offsets, self.targets, self.weights]
+        if self.distances is not None:
+            arrays += [self.distances, self.predecessors]
+        return sum(a.nbytes for a in arrays)
+
+    def _contains(self, t: int, qx: float, qy: float) -> bool:
+        a, b, c = (self._xy[v] for v in self._corners[t])
+        return (_orient(*a, *b, qx, qy) >= 0 and _orient(*b, *c, qx, qy) >= 0
+                and _orient(*c, *a, qx, qy) >= 0)
+
+    def _sees(self, px: float, py: float, qx: float, qy: float, triangle: int) -> bool:
+        """Tests whether the segment from P in TRIANGLE to Q stays in the polygon.
+
+        The walk crosses the triangles along the segment and passes through the vertices
+        it hits, from the triangle around the vertex whose angle holds the segment. Where
+        rounding leaves no way out of a triangle, the segment counts as blocked.
+        """
+        xy, corners, neighbors = self._xy, self._corners, self._neighbors
+        dx, dy = qx - px, qy - py
+        t, v, along = triangle, -1, 0.0
+        for _ in range(len(corners) + len(xy)):
+            if v >= 0:
+                vx, vy = xy[v]
+                for t, k in self._incident[v]:
+                    triangle = corners[t]
+                    a, b = triangle[(k + 1) % 3], triangle[(k + 2) % 3]
+                    if _orient(vx, vy, *xy[a], qx, qy) >= 0 and _orient(vx, vy, *xy[b], qx, qy) <= 0:
+                        break
+                else:
+                    return False
+                if self._contains(t, qx, qy):
+                    return True
+                if _orient(px, py, qx, qy, *xy[a]) == 0:
+                    v = a
+                elif _orient(px, py, qx, qy, *xy[b]) == 0:
+                    v = b
+                elif (t := neighbors[t][(k + 1) % 3]) < 0:
+                    return False
+                else:
+                    v = -1
+                if v >= 0:
+                    along = (xy[v][0] - px) * dx + (xy[v][1] - py) * dy
+                continue
+
+            if self._contains(t, qx, qy):
+                return True
+            triangle = corners[t]
+            sides = [_orient(px, py, qx, qy, *xy[c]) for c in triangle]
+            for k, c in enumerate(triangle):
+                if sides[k] == 0 and (xy[c][0] - px) * dx + (xy[c][1] - py) * dy > along:
+                    v = c
+                    along = (xy[c][0] - px) * dx + (xy[c][1] - py) * dy
+                    break
+            else:
+                for k in range(3):
+                    if sides[k] < 0 < sides[(k + 1) % 3]:
+                        if (t := neighbors[t][k]) < 0:
+                            return False
+                        break
+                else:
+                    return False
+        return False
+
+    def _visible_vertices(self, px: float, py: float, triangle: int = -1, vertex: int = -1) -> set[int]:
+        """Returns the vertices seen from P, which lies in TRIANGLE or is the vertex VERTEX.
+
+        Triangular expansion: every edge out of the start is looked through with the cone
+        of directions it spans, and each triangle behind it narrows the cone to the part
+        its far corner leaves open, until a boundary edge closes it. Vertices exactly on
+        the rim of a cone are left out; the path to them bends at the vertex that grazes
+        the rim, which is reflex and reached itself.
+        """
+        xy, corners, neighbors = self._xy, self._corners, self._neighbors
+        seen = set()
+        stack = []
+        starts = self._incident[vertex] if vertex >= 0 else [(triangle, k) for k in range(3)]
+        for t, k in starts:
+            # Seen from P, the start of every edge of a counterclockwise triangle is on the right.
+            edges = [(k + 1) % 3] if vertex >= 0 else [k]
+            for i in edges:
+                right, left = corners[t][i], corners[t][(i + 1) % 3]
+                seen.update((right, left))
+                if (u := neighbors[t][i]) >= 0:
+                    stack.append((u, t, right, left))
+        while stack:
+            t, behind, right, left = stack.pop()
+            triangle = corners[t]
+            j = neighbors[t].index(behind)
+            c = triangle[(j + 2) % 3]
+            cx, cy = xy[c]
+            in_right = _orient(px, py, *xy[right], cx, cy) > 0
+            in_left = _orient(px, py, *xy[left], cx, cy) < 0
+            if in_right and in_left:
+                seen.add(c)
+            # The edge from the right end of the one crossed to C, then the one from C to its left end.
+            if in_right and (u := neighbors[t][(j + 1) % 3]) >= 0:
+                stack.append((u, t, right, c if in_left else left))
+            if in_left and (u := neighbors[t][(j + 2) % 3]) >= 0:
+                stack.append((u, t, c if in_right else right, left))
+        return seen
+
+    def _visible_reflex(self, x: float, y: float, triangle: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the indices of the reflex vertices seen from (X, Y) in TRIANGLE along a tangent, and their distances."""
+        seen = self._reflex_index[list(self._visible_vertices(x, y, triangle=triangle))]
+        seen = np.sort(seen[seen >= 0])
+        seen = seen[self._tangent(self.reflex[seen], np.full(len(seen), x), np.full(len(seen), y))]
+        return seen, np.hypot(self.reflex_xy[seen, 0] - x, self.reflex_xy[seen, 1] - y)
+
+    def shortest_path(self, start: tuple[float, float], start_triangle: int, end: tuple[float, float],
+                      end_triangle: int) -> Optional[tuple[np.ndarray, float]]:
+        """Returns the shortest path from START to END as an (M, 2) array, and its length.
+
+        START_TRIANGLE and END_TRIANGLE are the local ids of the triangles that hold them.
+        None if END cannot be reached from START.
+        """
+        (sx, sy), (ex, ey) = start, end
+        if self._sees(sx, sy, ex, ey, start_triangle):
+            return np.array([start, end], dtype=np.float64), hypot(ex - sx, ey - sy)
+        first, to_first = self._visible_reflex(sx, sy, start_triangle)
+        last, to_last = self._visible_reflex(ex, ey, end_triangle)
+        if not len(first) or not len(last):
+            return None
+
+        if self.distances is not None:
+            totals = to_first[:, None] + self.distances[np.ix_(first, last)] + to_last[None, :]
+            i, j = np.unravel_index(np.argmin(totals), totals.shape)
+            if not np.isfinite(length := totals[i, j].item()):
+                return None
+            k, via = first[i].item(), [last[j].item()]
+            while via[-1] != k:
+                via.append(self.predecessors[k, via[-1]].item())
+            via = via[::-1]
+        else:
+            if (found := self._search(first, to_first, last, to_last, end)) is None:
+                return None
+            via, length = found
+        return np.concatenate(([start], self.reflex_xy[via], [end])).astype(np.float64), length
+
+    def _search(self, first: np.ndarray, to_first: np.ndarray, last: np.ndarray, to_last: np.ndarray,
+                end: tuple[float, float]) -> Optional[tuple[list[int], float]]:
+        """Returns the reflex vertices on the shortest path over the graph and its length.
+
+        Dijkstra from FIRST at the distances TO_FIRST to any of LAST, which are TO_LAST
+        away from END. The straight distance to END is added to the keys, which keeps the
+        search exact and expands the vertices towards END first; it stops once no shorter
+        way to END is left.
+        """
+        if self._adjacent is None:
+            targets, weights = self.targets.tolist(), self.weights.tolist()
+            offsets = self.offsets.tolist()
+            self._adjacent = [list(zip(targets[offsets[k]:offsets[k + 1]], weights[offsets[k]:offsets[k + 1]]))
+                              for k in range(len(self.reflex))]
+        adjacent, xy = self._adjacent, self._reflex_xy
+        ex, ey = end
+
+        exit_cost = dict(zip(last.tolist(), to_last.tolist()))
+        cost = dict(zip(first.tolist(), to_first.tolist()))
+        parent = {k: -1 for k in cost}
+        heap = [(c + hypot(xy[k][0] - ex, xy[k][1] - ey), k) for k, c in cost.items()]
+        heap.sort()
+        closed = set()
+        best, best_last = inf, -1
+        while heap:
+            f, k = heappop(heap)
+            if f >= best:
+                break
+            if k in closed:
+                continue
+            closed.add(k)
+            g = cost[k]
+            if k in exit_cost and g + exit_cost[k] < best:
+                best, best_last = g + exit_cost[k], k
+            for u, w in adjacent[k]:
+                if u not in closed and (c := g + w) < cost.get(u, inf):
+                    cost[u] = c
+                    parent[u] = k
+                    heappush(heap, (c + hypot(xy[u][0] - ex, xy[u][1] - ey), u))
+        if best_last < 0:
+            return None
+        via = [best_last]
+        while parent[via[-1]] >= 0:
+            via.append(parent[via[-1]])
+        return via[::-1], best
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class LocatorCache:
+    """Keeps the most recently used locators within a budget of triangles and/or bytes.
+
+    Every locator is charged the triangles and bytes given when it is added. The least
+    recently used locators are evicted first; the newest one is always kept, even if it
+    alone exceeds the budget. Without a budget nothing is ever evicted.
+    """
+
+    def __init__(self, max_triangles: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_triangles = max_triangles
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self.triangles = 0
+        self.nbytes = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable):
+        """Returns the locator stored under KEY and marks it as used, or None."""
+        if (entry := self._entries.get(key)) is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, locator, triangles: int, nbytes: int):
+        """Stores LOCATOR, charged TRIANGLES and NBYTES, and evicts cold locators until the budget holds."""
+        self.pop(key)
+        entry = (locator, triangles, nbytes)
+        self._entries[key] = entry
+        self.triangles += entry[1]
+        self.nbytes += entry[2]
+
+        while len(self._entries) > 1 and self._over_budget():
+            self.pop(next(iter(self._entries)))
+            self.evictions += 1
+        return
+
+    def pop(self, key: Hashable):
+        """Removes KEY and returns its locator, or None."""
+        if (entry := self._entries.pop(key, None)) is None:
+            return None
+        self.triangles -= entry[1]
+        self.nbytes -= entry[2]
+        return entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        self.triangles = 0
+        self.nbytes = 0
+
+    def _over_budget(self) -> bool:
+        return ((self.max_triangles is not None and self.triangles > self.max_triangles)
+                or (self.max_bytes is not None and self.nbytes > self.max_bytes))
+    pass
@@ -0,0 +1,95 @@
+from math import ceil, sqrt
+
+import numpy as np
+
+
+def _expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenates the integer ranges [start, start + count) for every pair."""
+    ends = np.cumsum(counts)
+    return np.repeat(starts - ends + counts, counts) + np.arange(ends[-1] if len(ends) else 0)
+
+
+def _boxes_contain(boxes: np.ndarray, xy: np.ndarray) -> np.ndarray:
+    """Tests whether each point lies in the matching (min_x, min_y, max_x, max_y) box."""
+    return ((boxes[:, 0] <= xy[:, 0]) & (xy[:, 0] <= boxes[:, 2])
+            & (boxes[:, 1] <= xy[:, 1]) & (xy[:, 1] <= boxes[:, 3]))
+
+
+class STRTree:
+    """Static R-tree over axis aligned boxes, packed bottom up with Sort-Tile-Recursive.
+
+    Boxes are given as an (M, 4) array of (min_x, min_y, max_x, max_y) rows and are
+    referred to by their row index. Every level of the tree is stored as an array of
+    node boxes plus CSR offsets into the level below, so queries never touch Python
+    objects per node.
+    """
+
+    def __init__(self, boxes: np.ndarray, capacity: int = 16):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if not len(boxes):
+            raise ValueError("Cannot build an STRTree without any boxes.")
+
+        self.capacity = capacity
+        self._order = self._tile(boxes, capacity)
+        self._item_boxes = boxes[self._order]
+
+        # Pack every level into nodes of CAPACITY consecutive entries of the level below.
+        self._levels: list[tuple[np.ndarray, np.ndarray]] = []
+        level_boxes = self._item_boxes
+        while True:
+            offsets = np.arange(0, len(level_boxes), capacity)
+            node_boxes = np.column_stack((np.minimum.reduceat(level_boxes[:, 0], offsets),
+                                          np.minimum.reduceat(level_boxes[:, 1], offsets),
+                                          np.maximum.reduceat(level_boxes[:, 2], offsets),
+                                          np.maximum.reduceat(level_boxes[:, 3], offsets)))
+            self._levels.append((node_boxes, np.append(offsets, len(level_boxes))))
+            if len(node_boxes) == 1:
+                break
+            level_boxes = node_boxes
+        self._levels.reverse()
+
+    @staticmethod
+    def _tile(boxes: np.ndarray, capacity: int) -> np.ndarray:
+        """Orders the boxes into vertical slabs by center x, then by center y within a slab."""
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        slabs = ceil(sqrt(ceil(len(boxes) / capacity)))
+        slab_size = slabs * capacity
+
+        by_x = np.argsort(centers[:, 0], kind='stable')
+        order = []
+        for start in range(0, len(boxes), slab_size):
+            slab = by_x[start:start + slab_size]
+            order.append(slab[np.argsort(centers[slab, 1], kind='stable')])
+        return np.concatenate(order)
+
+    @property
+    def bounds(self) -> np.ndarray:
+        """Returns the box covering every indexed box."""
+        return self._levels[0][0][0]
+
+    def query_points(self, xy: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns (point index, box index) pairs for every box that contains one of the points.
+
+        Pairs are sorted by point index and, for the same point, by box index.
+        """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        points = np.arange(len(xy))
+        nodes = np.zeros(len(xy), dtype=np.int64)
+
+        for node_boxes, offsets in self._levels:
+            hit = _boxes_contain(node_boxes[nodes], xy[points])
+            points, nodes = points[hit], nodes[hit]
+            counts = offsets[nodes + 1] - offsets[nodes]
+            points = np.repeat(points, counts)
+            nodes = _expand_ranges(offsets[nodes], counts)
+
+        hit = _boxes_contain(self._item_boxes[nodes], xy[points])
+        points, items = points[hit], self._order[nodes[hit]]
+        pairs = np.lexsort((items, points))
+        return points[pairs], items[pairs]
+
+    def query(self, x: float, y: float) -> list[int]:
+        """Returns the indices of the boxes that contain the point, in ascending order."""
+        _, items = self.query_points(np.array(((x, y),)))
+        return items.tolist()
+    pass
@@ -2,19 +2,30 @@ from random import random
 from math import sqrt
 from typing import Optional
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
 
-from itertools import chain
-from copy import deepcopy
+import numpy as np
 # from .spatial import triangulate_polygon
 
-from lib.triangulation.earcut import earcut
+from lib.triangulation.batch import triangulate, triangulate_many
 
 
 class Point(object):
+    """An immutable point; slotted, so it carries no per-instance __dict__."""
+    __slots__ = ('x', 'y')
 
     def __init__(self, x, y):
-        self.x = x
-        self.y = y
+        object.__setattr__(self, 'x', x)
+        object.__setattr__(self, 'y', y)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Point is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Point is immutable.")
+
+    def __reduce__(self):
+        return Point, (self.x, self.y)
 
     def __str__(self):
         return "(" + str(self.x) + ", " + str(self.y) + ")"
@@ -50,11 +61,96 @@ class Point(object):
         return [self.x, self.y]
 
 
+class PointArray(Sequence):
+    """A sequence of points stored in one contiguous (N, 2) float64 buffer, XY.
+
+    Indexing creates Points on the fly and slicing returns PointArrays over views of
+    the buffer, so shapes built from a PointArray keep no Point objects of their own.
+    """
+    __slots__ = ('xy',)
+
+    def __init__(self, xy):
+        xy = np.ascontiguousarray(xy, dtype=np.float64)
+        if xy.ndim != 2 or xy.shape[1] != 2:
+            raise ValueError(f"Expected an (N, 2) array of coordinates, got shape {xy.shape}.")
+        self.xy = xy
+
+    @classmethod
+    def from_points(cls, points) -> 'PointArray':
+        return cls(as_xy(points))
+
+    def __len__(self) -> int:
+        return len(self.xy)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return PointArray(self.xy[i])
+        x, y = self.xy[i].tolist()
+        return Point(x, y)
+
+    def __iter__(self):
+        return (Point(x, y) for x, y in self.xy.tolist())
+
+    def __add__(self, other) -> 'PointArray':
+        return PointArray(np.concatenate((self.xy, as_xy(other))))
+
+    def __radd__(self, other) -> 'PointArray':
+        return PointArray(np.concatenate((as_xy(other), self.xy)))
+
+    def __array__(self, dtype=None, copy=None):
+        return self.xy if dtype is None else self.xy.astype(dtype)
+
+    def __str__(self) -> str:
+        return " -> ".join(str(p) for p in self)
+
+
+def as_xy(points) -> np.ndarray:
+    """Returns POINTS as an (N, 2) float64 array; a PointArray's buffer is returned as is."""
+    if isinstance(points, PointArray):
+        return points.xy
+    if isinstance(points, np.ndarray):
+        return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return np.array([(p.x, p.y) for p in points], dtype=np.float64).reshape(-1, 2)
+
+
 def ccw(a: Point, b: Point, c: Point):
     """Tests whether the line formed by A, B, and C is ccw"""
     return (b.x - a.x) * (c.y - a.y) > (b.y - a.y) * (c.x - a.x)
 
 
+def triangle_contains(tri: Sequence[Sequence[float]], x: float, y: float) -> bool:
+    """Scalar twin of triangles_contain for one triangle given as three (x, y) pairs."""
+    (ax, ay), (bx, by), (cx, cy) = tri
+    if (bx - ax) * (cy - ay) == (by - ay) * (cx - ax):
+        return False
+    d1 = (bx - ax) * (y - ay) - (by - ay) * (x - ax)
+    d2 = (cx - bx) * (y - by) - (cy - by) * (x - bx)
+    d3 = (ax - cx) * (y - cy) - (ay - cy) * (x - cx)
+    return (d1 >= 0 and d2 >= 0 and d3 >= 0) or (d1 <= 0 and d2 <= 0 and d3 <= 0)
+
+
+def triangles_contain(tri_xy: np.ndarray, pts_xy: np.ndarray) -> np.ndarray:
+    """Tests points against triangles with three orientation signs per pair.
+
+    TRI_XY has shape (..., 3, 2) and PTS_XY shape (..., 2); the leading dimensions
+    broadcast, so (T, 3, 2) against (N, 1, 2) tests every point against every triangle.
+    Triangles are closed whatever their winding: a point on an edge or a vertex is inside
+    every triangle that shares it, so no point falls between two neighbors. Degenerate
+    triangles, with collinear corners, contain nothing; their points always lie on an
+    edge of a proper neighbor.
+    """
+    a, b, c = tri_xy[..., 0, :], tri_xy[..., 1, :], tri_xy[..., 2, :]
+    x, y = pts_xy[..., 0], pts_xy[..., 1]
+
+    def orient(u, v):
+        return (v[..., 0] - u[..., 0]) * (y - u[..., 1]) - (v[..., 1] - u[..., 1]) * (x - u[..., 0])
+
+    d1, d2, d3 = orient(a, b), orient(b, c), orient(c, a)
+    proper = (b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1]) != (b[..., 1] - a[..., 1]) * (c[..., 0] - a[..., 0])
+    return proper & (((d1 >= 0) & (d2 >= 0) & (d3 >= 0))
+                     | ((d1 <= 0) & (d2 <= 0) & (d3 <= 0)))
+
+
 def intersect(a1, b1, a2, b2):
     """Returns True if the line segments a1b1 and a2b2 intersect."""
     return (ccw(a1, b1, a2) != ccw(a1, b1, b2)
@@ -138,7 +234,7 @@ class Line:
 
 class Shape2d(ABC):
 
-    def __init__(self, points: list[Point]):
+    def __init__(self, points: Sequence[Point]):
         if len(points) < 3:
             raise ValueError("Polygon must have at least three vertices.")
 
@@ -160,13 +256,18 @@ class Shape2d(ABC):
 
     @property
     def hash(self):
-        if self.__hash:
-            return self.__hash
-        return hash(tuple(sorted(self.points, key=lambda p: p.x)))
+        if self.__hash is None:
+            self.__hash = hash(tuple(sorted(self.points, key=lambda p: p.x)))
+        return self.__hash
 
     def reset_hash(self):
         self.__hash = None
 
+    @property
+    def xy(self) -> np.ndarray:
+        """Returns the points as an (N, 2) float64 array, without a copy for a PointArray."""
+        return as_xy(self.points)
+
     @property
     def x(self) -> list[float]:
         return [p.x for p in self.points] + [self.points[0].x]
@@ -205,6 +306,8 @@ class Triangle(Shape2d):
         self.a = a
         self.b = b
         self.c = c
+        # Assigned by the locator that owns the triangle, see SinglePolygonLocator.
+        self.id: Optional[int] = None
         super(Triangle, self).__init__([a, b, c])
 
     def area(self) -> float:
@@ -224,77 +327,87 @@ class Triangle(Shape2d):
         r2 = random()
         return (1 - sqrt(r1)) * a + sqrt(r1) * (1 - r2) * b + r2 * sqrt(r1) * c
 
+    def centroid(self) -> Point:
+        return Point((self.a.x + self.b.x + self.c.x) / 3, (self.a.y + self.b.y + self.c.y) / 3)
+
     def contains_point(self, point: Point) -> bool:
-        return self._convex_contains_point(point)
+        return triangle_contains(((self.a.x, self.a.y), (self.b.x, self.b.y), (self.c.x, self.c.y)),
+                                 point.x, point.y)
     pass
 
 
 class Polygon(Shape2d):
 
-    def __init__(self, points: list[Point]):
+    def __init__(self, points: Sequence[Point], holes: Sequence[Sequence[Point]] = ()):
+        """POINTS is the outline and HOLES the rings cut out of it, which must lie inside it
+        and must not overlap each other."""
         if len(points) < 3:
             raise ValueError("Polygon must have at least three vertices.")
 
         self._triangulation: Optional[list[Triangle]] = None
-        self.hole: Optional[list[Point]] = None
+        self._prepared: Optional[PreparedPolygon] = None
+        self.holes: list[Sequence[Point]] = [hole for hole in holes if len(hole)]
         super(Polygon, self).__init__(points)
 
+    @property
+    def hole(self) -> Optional[Sequence[Point]]:
+        """The first hole, or None; kept for code written when a polygon had at most one."""
+        return self.holes[0] if self.holes else None
+
+    @hole.setter
+    def hole(self, hole: Optional[Sequence[Point]]):
+        self.holes = [hole] if hole else []
+
+    @property
+    def prepared(self) -> 'PreparedPolygon':
+        """The polygon's cached PreparedPolygon; like the triangulation, it assumes the points and holes stay put."""
+        if self._prepared is None:
+            self._prepared = PreparedPolygon(self.points, self.holes)
+        return self._prepared
+
     @property
     def triangulation(self) -> list[Triangle]:
         if self._triangulation:
             return self._triangulation
-        return self.triangulate_polygon(self.hole)
-
-    def triangulate_polygon(self, hole: list[Point] = None) -> list[Triangle]:
-        """Triangulates a polygon with up to one hole."""
-        points_tuples = list(chain.from_iterable((p.x, p.y) for p in self.points))
-        poly_points = deepcopy(self.points)
-        hole_start_idx = None
+        return self.triangulate_polygon(self.holes)
 
-        if hole:
-            hole_start_idx = [len(points_tuples) // 2]
-            poly_points += hole
-            points_tuples += list(chain.from_iterable((p.x, p.y) for p in hole))
+    def triangulate_polygon(self, holes: Sequence[Sequence[Point]] = None, engine: str = 'earcut',
+                            delaunay: bool = False) -> list[Triangle]:
+        """Triangulates the outline with HOLES, a list of rings, cut out of it.
 
-        triangles = earcut(points_tuples, hole_start_idx, 2)
-
-        self._triangulation = [Triangle(poly_points[triangles[3 * i + 0]],
-                               poly_points[triangles[3 * i + 1]],
-                               poly_points[triangles[3 * i + 2]])
-                               for i in range(len(triangles) // 3)]
+        ENGINE is 'earcut' or 'monotone'; DELAUNAY refines the result into a constrained
+        Delaunay triangulation. See lib.triangulation.batch.triangulate.
+        """
+        xy, hole_start_idx = self._earcut_input(holes)
+        return self._set_triangulation(triangulate(xy, hole_start_idx, engine, delaunay), holes)
+
+    def _earcut_input(self, holes: Sequence[Sequence[Point]] = None) -> tuple[np.ndarray, Optional[list[int]]]:
+        """Returns the outline and HOLES as one coordinate array, and the earcut hole indices."""
+        rings = [as_xy(hole) for hole in holes or () if len(hole)]
+        if not rings:
+            return self.xy, None
+        starts = np.cumsum([self.n] + [len(ring) for ring in rings[:-1]]).tolist()
+        return np.concatenate([self.xy] + rings), starts
+
+    def _set_triangulation(self, indices: np.ndarray, holes: Sequence[Sequence[Point]] = None) -> list[Triangle]:
+        """Caches the triangles of a (T, 3) array of vertex indices into the outline followed by HOLES."""
+        poly_points = list(self.points)
+        for hole in holes or ():
+            poly_points += list(hole)
+        self._triangulation = [Triangle(poly_points[a], poly_points[b], poly_points[c])
+                               for a, b, c in indices.tolist()]
         return self._triangulation
 
     def contains_point(self, p: Point) -> bool:
         """Returns True if p is inside the Polygon."""
-        if self.is_convex():
-            return self._convex_contains_point(p)
-        else:
-            # If concave, must triangulate and check individual triangles
-            triangles = self.triangulation
-            for triangle in triangles:
-                if triangle.contains_point(p):
-                    return True
-            return False
+        return self.prepared.contains_point(p)
 
     def is_convex(self) -> bool:
-        target = None
-        for i in range(self.n):
-            # Check every triplet of points
-            a = self.points[i % self.n]
-            b = self.points[(i + 1) % self.n]
-            c = self.points[(i + 2) % self.n]
-
-            if not target:
-                target = ccw(a, b, c)
-            else:
-                if ccw(a, b, c) != target:
-                    return False
-
-        return True
+        return self.prepared.convex
 
     def ccw(self) -> bool:
         """Returns True if the points are provided in CCW order."""
-        return ccw(self.points[0], self.points[1], self.points[2])
+        return self.prepared.ccw
 
     def split(self, interior=False):
         """
@@ -369,23 +482,18 @@ class Polygon(Shape2d):
             return random_split()
 
         poly1, poly2 = random_split()
-        # If area has increased, invalid selection
-        while poly1.area() + poly2.area() > self.area():
+        # If area has increased, invalid selection. The slack absorbs rounding.
+        while poly1.area() + poly2.area() > self.area() * (1 + 1e-9):
             poly1, poly2 = random_split()
         return poly1, poly2
 
     def area(self) -> float:
         """Returns the area of the polygon."""
-        triangles = self.triangulation
-        areas = [t.area() for t in triangles]
-        return sum(areas)
+        return self.prepared.area
 
     def interior_point(self) -> Point:
         """Returns a random point interior point via rejection sampling."""
-        min_x = min([p.x for p in self.points])
-        max_x = max([p.x for p in self.points])
-        min_y = min([p.y for p in self.points])
-        max_y = max([p.y for p in self.points])
+        min_x, min_y, max_x, max_y = self.prepared.bbox
 
         def x():
             return min_x + random() * (max_x - min_x)
@@ -401,10 +509,7 @@ class Polygon(Shape2d):
 
     def exterior_point(self) -> Point:
         """Returns a random exterior point near the polygon."""
-        min_x = min([p.x for p in self.points])
-        max_x = max([p.x for p in self.points])
-        min_y = min([p.y for p in self.points])
-        max_y = max([p.y for p in self.points])
+        min_x, min_y, max_x, max_y = self.prepared.bbox
 
         def off():
             return 1 - 2 * random()
@@ -440,3 +545,148 @@ class Polygon(Shape2d):
         if self.n == 3:
             return Triangle(*self.points)
     pass
+
+
+def triangulate_polygons(polygons: Sequence[Polygon], workers: int = None, engine: str = 'earcut',
+                         delaunay: bool = False):
+    """Triangulates every polygon that has no triangulation yet with triangulate_many.
+
+    The triangulations are cached on the polygons, as if their triangulation property
+    had been read; WORKERS, ENGINE and DELAUNAY are passed on to triangulate_many.
+    """
+    pending = [polygon for polygon in polygons if not polygon._triangulation]
+    inputs = [polygon._earcut_input(polygon.holes) for polygon in pending]
+    indices = triangulate_many([xy for xy, _ in inputs], [holes for _, holes in inputs], workers, engine, delaunay)
+    for polygon, triangles in zip(pending, indices):
+        polygon._set_triangulation(triangles, polygon.holes)
+
+
+def polygons_from_parts(points: Sequence[Sequence[float]], parts: Sequence[int]) -> list[Polygon]:
+    """Splits the rings of a shapefile record into polygons with holes.
+
+    POINTS and PARTS are the fields of a pyshp shape: ring k runs from PARTS[k] up to the
+    next part and repeats its first point at the end. As in the shapefile specification,
+    clockwise rings are outlines and counter-clockwise rings holes; every hole goes to the
+    smallest outline that contains it. Holes that no outline contains are taken as
+    outlines themselves, as are the rings of a record that has no clockwise ring.
+    """
+    bounds = list(parts) + [len(points)]
+    outlines, holes = [], []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        ring = PointArray(points[start:end - 1])
+        if len(ring) < 3:
+            continue
+        (outlines if PreparedPolygon._signed_area(ring.xy) < 0 else holes).append(ring)
+    if not outlines:
+        outlines, holes = holes, []
+
+    prepared = [PreparedPolygon(outline) for outline in outlines]
+    by_area = sorted(range(len(outlines)), key=lambda i: prepared[i].area)
+    rings: list[list[PointArray]] = [[] for _ in outlines]
+    for hole in holes:
+        owner = next((i for i in by_area if prepared[i].contains_point(hole[0])), None)
+        if owner is None:
+            outlines.append(hole)
+            rings.append([])
+        else:
+            rings[owner].append(hole)
+    return [Polygon(outline, holes) for outline, holes in zip(outlines, rings)]
+
+
+class PreparedPolygon:
+    """Geometry of a polygon computed once for repeated queries.
+
+    Holds the bounding box, the shoelace area, the orientation and the convexity of the
+    outline, the latter three ignoring HOLES apart from subtracting their area. Point
+    containment uses the crossing rule of Shape2d._convex_contains_point over the edges
+    of the outline and the holes, but only looks at the edges registered in the band of
+    a uniform grid of horizontal bands that the point falls into.
+    """
+
+    def __init__(self, points: Sequence[Point], holes: Sequence[Sequence[Point]] = ()):
+        xy = as_xy(points)
+        self.n = len(xy)
+        self.bbox = (*xy.min(axis=0).tolist(), *xy.max(axis=0).tolist())
+
+        signed = self._signed_area(xy)
+        self.ccw = signed > 0
+
+        edges = np.roll(xy, -1, axis=0) - xy
+        turns = edges[:, 0] * np.roll(edges[:, 1], -1) - edges[:, 1] * np.roll(edges[:, 0], -1)
+        self.convex = bool((turns >= 0).all() or (turns <= 0).all())
+
+        rings = [xy] + [as_xy(hole) for hole in holes if len(hole)]
+        self.area = abs(signed) - sum(abs(self._signed_area(ring)) for ring in rings[1:])
+        self._build_grid(np.concatenate([np.concatenate((ring, np.roll(ring, -1, axis=0)), axis=1)
+                                         for ring in rings]))
+
+    @staticmethod
+    def _signed_area(xy: np.ndarray) -> float:
+        x, y = xy[:, 0], xy[:, 1]
+        return float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2
+
+    def _band(self, y):
+        return np.clip(((y - self._y0) * self._scale).astype(np.int64), 0, self._bands - 1)
+
+    def _build_grid(self, segments: np.ndarray):
+        """Registers every non-horizontal edge in each band its y range overlaps."""
+        segments = segments[segments[:, 1] != segments[:, 3]]
+        self._segments = segments
+        self._edges = segments.tolist()
+
+        # About four band registrations per edge, fewer bands for edges that span many.
+        min_y, max_y = self.bbox[1], self.bbox[3]
+        span = float(np.abs(segments[:, 3] - segments[:, 1]).sum())
+        bands = 4 * len(segments) * (max_y - min_y) / span if span else 1
+        self._bands = int(max(1, min(bands, 2 * len(segments), 4096)))
+        self._y0 = min_y
+        self._scale = self._bands / (max_y - min_y) if max_y > min_y else 0.0
+
+        low = self._band(np.minimum(segments[:, 1], segments[:, 3]))
+        high = self._band(np.maximum(segments[:, 1], segments[:, 3]))
+        counts = high - low + 1
+        edge = np.repeat(np.arange(len(segments)), counts)
+        band = np.repeat(low, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+
+        order = np.argsort(band, kind='stable')
+        self._band_edges = edge[order].astype(np.int32)
+        self._band_offsets = np.searchsorted(band[order], np.arange(self._bands + 1)).astype(np.int64)
+
+    def contains_point(self, p: Point) -> bool:
+        """Returns True if p is inside the polygon."""
+        min_x, min_y, max_x, max_y = self.bbox
+        px, py = p.x, p.y
+        if px < min_x or px > max_x or py < min_y or py > max_y:
+            return False
+
+        band = min(max(int((py - self._y0) * self._scale), 0), self._bands - 1)
+        start, end = self._band_offsets[band:band + 2].tolist()
+        is_inside = False
+        for i in self._band_edges[start:end].tolist():
+            x1, y1, x2, y2 = self._edges[i]
+            if (y1 < py <= y2 or y2 < py <= y1) and px <= max(x1, x2):
+                if x1 == x2 or px <= (py - y1) * (x2 - x1) / (y2 - y1) + x1:
+                    is_inside = not is_inside
+        return is_inside
+
+    def contains_points(self, xy: np.ndarray) -> np.ndarray:
+        """Tests an (N, 2) array of points, see contains_point."""
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        min_x, min_y, max_x, max_y = self.bbox
+        px, py = xy[:, 0], xy[:, 1]
+        candidates = np.flatnonzero((px >= min_x) & (px <= max_x) & (py >= min_y) & (py <= max_y))
+
+        band = self._band(py[candidates])
+        start, end = self._band_offsets[band], self._band_offsets[band + 1]
+        counts = end - start
+        point = np.repeat(candidates, counts)
+        edge = self._band_edges[np.repeat(start, counts) + (np.arange(counts.sum())
+                                                            - np.repeat(np.cumsum(counts) - counts, counts))]
+
+        x1, y1, x2, y2 = self._segments[edge].T
+        x, y = px[point], py[point]
+        crosses = (((y1 < y) & (y <= y2)) | ((y2 < y) & (y <= y1))) & (x <= np.maximum(x1, x2))
+        crosses &= (x1 == x2) | (x <= (y - y1) * (x2 - x1) / (y2 - y1) + x1)
+
+        return np.bincount(point[crosses], minlength=len(xy)) % 2 == 1
+    pass
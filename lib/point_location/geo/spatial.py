@@ -5,13 +5,13 @@ from itertools import chain
 from copy import deepcopy
 
 from . import shapes
-from .shapes import Point, Polygon, Triangle
+from .shapes import Point, Polygon, Triangle, as_xy
 from lib.triangulation.earcut import earcut
 
 
 def to_numpy(points: list[Point]):
     """Convert a list of points to a NumPy array."""
-    return np.array(list(map(lambda p: p.np(), points)), np.float32)
+    return as_xy(points).astype(np.float32)
 
 
 # def triangulate_polygon(poly: Polygon, hole: list[Point] = None) -> list[Triangle]:
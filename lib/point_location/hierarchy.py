@@ -0,0 +1,174 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+from lib.point_location.geo.shapes import Point, Polygon, Triangle, Shape2d, triangles_contain
+from lib.triangulation.earcut import earcut
+
+
+class BoundingTriangleCreationError(Exception):
+    pass
+
+
+class HierarchyBuilder:
+    """Builds the Kirkpatrick search hierarchy over a triangulated subdivision.
+
+    Triangles are kept as vertex index triples in counter-clockwise order. Every vertex
+    carries the set of live triangles incident to it and the set of its neighbors, and
+    both are patched locally whenever a vertex is removed, so a round only pays for the
+    vertices it looks at and the expected total cost is linear in the number of vertices.
+    """
+
+    def __init__(self, max_degree: int = 8):
+        self.max_degree = max_degree
+        self._vertex_ids: dict[Point, int] = {}
+        self._xy: list[tuple[float, float]] = []
+        self._incident: list[set[int]] = []
+        self._neighbors: list[set[int]] = []
+
+        self._nodes: list[tuple[int, int, int]] = []
+        self._node_region: list[int] = []
+        self._children: list[list[int]] = []
+
+    def _vertex(self, p: Point) -> int:
+        if (v := self._vertex_ids.get(p)) is None:
+            v = self._vertex_ids[p] = len(self._xy)
+            self._xy.append((p.x, p.y))
+            self._incident.append(set())
+            self._neighbors.append(set())
+        return v
+
+    def _orientation(self, a: int, b: int, c: int) -> float:
+        (ax, ay), (bx, by), (cx, cy) = self._xy[a], self._xy[b], self._xy[c]
+        return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+    def _add_node(self, a: int, b: int, c: int, region: int = -1, children: list[int] = None) -> int:
+        if self._orientation(a, b, c) < 0:
+            b, c = c, b
+
+        node = len(self._nodes)
+        self._nodes.append((a, b, c))
+        self._node_region.append(region)
+        self._children.append(children or [])
+        for u, v in ((a, b), (b, c), (c, a)):
+            self._incident[u].add(node)
+            self._neighbors[u].add(v)
+            self._neighbors[v].add(u)
+        return node
+
+    def _add_shape(self, shape: Shape2d, region: int = -1):
+        if shape.n < 3:
+            raise ValueError(f"Region with points: {shape.points} has "
+                             f"less than 3 points.")
+
+        if isinstance(shape, Polygon) and shape.n > 3:
+            triangles = shape.triangulation
+        elif shape.n == 3:
+            triangles = [shape]
+        else:
+            raise ValueError(f"Region with points: {shape.points} cannot be "
+                             f"converted to a triangle.")
+
+        for triangle in triangles:
+            self._add_node(*(self._vertex(p) for p in triangle.points), region=region)
+
+    def _link(self, v: int) -> Optional[list[int]]:
+        """Returns the neighbors of v in counter-clockwise order, or None if they do not form a cycle."""
+        following = {}
+        for node in self._incident[v]:
+            a, b, c = self._nodes[node]
+            u, w = (b, c) if a == v else (c, a) if b == v else (a, b)
+            following[u] = w
+
+        if len(following) != len(self._incident[v]):
+            return None
+
+        ring = [next(iter(following))]
+        while (w := following.get(ring[-1])) != ring[0]:
+            if w is None or len(ring) == len(following):
+                return None
+            ring.append(w)
+        return ring if len(ring) == len(following) else None
+
+    def _remove_vertex(self, v: int) -> bool:
+        """Retriangulates the hole left by v, returning False if it has to stay for now."""
+        if (ring := self._link(v)) is None:
+            return False
+
+        indices = earcut([c for u in ring for c in self._xy[u]])
+        if len(indices) != 3 * (len(ring) - 2):
+            return False
+
+        removed = list(self._incident[v])
+        for node in removed:
+            for u in self._nodes[node]:
+                if u != v:
+                    self._incident[u].discard(node)
+        for u in self._neighbors[v]:
+            self._neighbors[u].discard(v)
+        self._incident[v].clear()
+        self._neighbors[v].clear()
+
+        for i in range(0, len(indices), 3):
+            self._add_node(ring[indices[i]], ring[indices[i + 1]], ring[indices[i + 2]], children=removed)
+        return True
+
+    def build(self, regions: list[Shape2d], boundary: list[Triangle], avoid: Iterable[Point]):
+        """Builds the hierarchy and returns it as the CSR arrays SinglePolygonLocator keeps.
+
+        REGIONS are the leaves that locate reports, BOUNDARY fills the space between them
+        and the bounding triangle, whose corners are given in AVOID. Nodes are numbered so
+        that the root is 0. Raises BoundingTriangleCreationError if the bounding triangle
+        leaves out a vertex of the regions, as the hierarchy would then miss part of them.
+        """
+        for i, region in enumerate(regions):
+            self._add_shape(region, i)
+        for triangle in boundary:
+            self._add_shape(triangle)
+
+        corners = [self._vertex(p) for p in avoid]
+        xy = np.array(self._xy, dtype=np.float64)
+        if not triangles_contain(xy[corners], xy).all():
+            raise BoundingTriangleCreationError("The bounding triangle does not contain the outline.")
+        alive = [v for v in range(len(self._xy)) if v not in corners]
+
+        blocked = [-1] * len(self._xy)
+        level = 0
+        while alive:
+            remaining = []
+            for v in alive:
+                if blocked[v] == level or len(self._neighbors[v]) > self.max_degree:
+                    remaining.append(v)
+                    continue
+
+                neighbors = list(self._neighbors[v])
+                if not self._remove_vertex(v):
+                    remaining.append(v)
+                    continue
+                for u in neighbors:
+                    blocked[u] = level
+
+            if len(remaining) == len(alive):
+                break
+            alive = remaining
+            level += 1
+
+        # Normally a single triangle spanned by the corners is left. If some vertices could
+        # not be removed, a root over the corners adopts whatever triangles remain.
+        top = sorted(set().union(*(self._incident[v] for v in corners + alive)))
+        if len(top) != 1 or top[0] != len(self._nodes) - 1:
+            self._nodes.append(tuple(corners))
+            self._node_region.append(-1)
+            self._children.append(top)
+
+        # Reversing the creation order puts the root first and every child after its parents.
+        last = len(self._nodes) - 1
+        counts = [len(children) for children in reversed(self._children)]
+        child_offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+        np.cumsum(counts, out=child_offsets[1:])
+        child_index = np.array([last - c for children in reversed(self._children) for c in children],
+                               dtype=np.int32)
+        node_region = np.array(self._node_region[::-1], dtype=np.int32)
+        node_xy = np.array(self._xy, dtype=np.float64)[np.array(self._nodes[::-1], dtype=np.int64)]
+        return node_xy, child_offsets, child_index, node_region
+    pass
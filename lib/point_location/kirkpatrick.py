@@ -1,28 +1,233 @@
+import sys
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
 from functools import reduce
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
 from typing import Optional, Iterable
 
+import numpy as np
 
 from lib.point_location.geo.spatial import convex_hull
-from lib.point_location.geo.shapes import Point, Polygon, Triangle, Shape2d
+from lib.point_location.geo.shapes import (Point, Polygon, Triangle, Shape2d, as_xy, triangle_contains,
+                                           triangles_contain)
 from . import min_triangle
 from lib.point_location.geo.graph import UndirectedGraph, DirectedGraph
-from lib.path_finding.path_tools import DCEL
-
-
-class BoundingTriangleCreationError(Exception):
-    pass
+from lib.point_location.geo.rtree import STRTree
+from lib.path_finding.path_tools import DCEL, funnel_path
+from lib.path_finding.path_map import ShortestPathMap
+from lib.path_finding.visibility import VisibilityGraph
+from lib.point_location import storage
+from lib.point_location.cache import LocatorCache
+from lib.point_location.hierarchy import BoundingTriangleCreationError, HierarchyBuilder
+from lib.point_location.trapezoid import TrapezoidalMap
+
+
+# Bumped whenever the layout of the arrays written by MultiPolygonLocator.save changes.
+LOCATOR_FORMAT_VERSION = 5
+
+# MultiPolygonLocator gives every polygon a block of 2**ID_BITS triangle ids.
+ID_BITS = 32
+
+
+def _object_bytes(roots: list, counted: Iterable = ()) -> int:
+    """Returns the memory held by ROOTS and the Python objects reachable from them.
+
+    Containers, instance dictionaries and slots are followed; every object is counted
+    once with sys.getsizeof, and the objects in COUNTED not at all. Arrays count their
+    own buffer, if they have one.
+    """
+    seen = {id(obj) for obj in counted}
+    stack = list(roots)
+    nbytes = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType, MethodType, BuiltinFunctionType)):
+            continue
+        seen.add(id(obj))
+        nbytes += sys.getsizeof(obj)
+        if isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif not isinstance(obj, (np.ndarray, str, bytes, bytearray, int, float, memoryview)):
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                stack.extend(getattr(obj, name) for name in getattr(cls, '__slots__', ())
+                             if hasattr(obj, name))
+    return nbytes
 
 
 class SinglePolygonLocator:
 
-    def __init__(self, regions: list[Triangle], outline=None):
-        self.triangles: dict[int, Triangle] = {hash(t): t for t in regions}
-        self.dcel = DCEL(regions)
-        self._preprocess(regions, outline)
+    def __init__(self, regions: list[Triangle], outline=None, builder: str = 'incremental',
+                 engine: str = 'kirkpatrick', first_id: int = 0, landmarks: int = 0,
+                 path_strategy: str = 'funnel'):
+        """Builds the point location structure over REGIONS.
+
+        ENGINE is either 'kirkpatrick', the triangle hierarchy, or 'trapezoid', a
+        randomized incremental TrapezoidalMap over the region edges. For the hierarchy,
+        BUILDER selects how it is built: 'incremental' (HierarchyBuilder) patches vertex
+        adjacency between rounds, 'graph' rebuilds an UndirectedGraph every round.
+
+        OUTLINE is the Polygon that REGIONS triangulate, holes included; without it the
+        bounding triangle is fitted around their convex hull. Points in a hole are not
+        located. The locator keeps its own copies of REGIONS; copy i gets the triangle id
+        FIRST_ID + i, and its local id i addresses the DCEL.
+
+        With LANDMARKS > 0 that many landmarks are selected on the DCEL, which speeds up
+        repeated channel searches, see DCEL.select_landmarks. They are saved with the locator.
+
+        PATH_STRATEGY selects how get_shortest_path finds a path: 'funnel' pulls the path
+        taut in the channel found by DCEL.astar, 'visibility' searches the VisibilityGraph
+        of the reflex vertices, which is built on first use and finds the shortest path
+        over all channels.
+        """
+        if engine not in ('kirkpatrick', 'trapezoid'):
+            raise ValueError(f"Unknown point location engine: {engine}")
+        if builder not in ('incremental', 'graph'):
+            raise ValueError(f"Unknown hierarchy builder: {builder}")
+        if path_strategy not in ('funnel', 'visibility'):
+            raise ValueError(f"Unknown path strategy: {path_strategy}")
+
+        self.engine = engine
+        self.path_strategy = path_strategy
+        self._visibility: Optional[VisibilityGraph] = None
+        self.first_id = first_id
+        # Ids go on copies, so that locators built over the same cached triangulation
+        # do not overwrite each other's.
+        regions = [copy(region) for region in regions]
+        for i, region in enumerate(regions):
+            region.id = first_id + i
+        self._dcel: Optional[DCEL] = DCEL(regions)
+        self._set_adjacency(self._dcel.neighbors, self._dcel.corners, self._dcel.vertex_xy)
+        if landmarks > 0:
+            self._dcel.select_landmarks(landmarks)
+            self._set_landmarks(self._dcel.landmarks, self._dcel.landmark_distances, self._dcel.landmark_spans)
+        else:
+            self._set_landmarks()
+        self._trapezoids: Optional[TrapezoidalMap] = None
+        if engine == 'trapezoid':
+            self._regions = regions
+            self._trapezoids = TrapezoidalMap(regions)
+        else:
+            self._preprocess(regions, outline, builder)
+        self._set_regions()
+        self._object_state = None
+        self._measured_bytes = 0
         self.__starting_point = None
         self.__starting_triangle = None
 
-    def _preprocess(self, regions: list[Triangle], outline=None):
+    @classmethod
+    def _from_arrays(cls, first_id: int, region_xy: np.ndarray, node_xy: np.ndarray,
+                     child_offsets: np.ndarray, child_index: np.ndarray, node_region: np.ndarray,
+                     bbox: np.ndarray, neighbors: np.ndarray, corners: np.ndarray, vertex_xy: np.ndarray,
+                     landmarks: np.ndarray = None, landmark_distances: np.ndarray = None,
+                     landmark_spans: np.ndarray = None) -> 'SinglePolygonLocator':
+        """Wraps the arrays of an already frozen locator, e.g. ones mapped from a file.
+
+        The region triangles and the DCEL are only materialized when first needed; the
+        DCEL then wraps NEIGHBORS, CORNERS and VERTEX_XY rather than rebuilding them, and
+        gets the landmark arrays, if any.
+        """
+        locator = cls.__new__(cls)
+        locator.engine = 'kirkpatrick'
+        locator.path_strategy = 'funnel'
+        locator._visibility = None
+        locator.first_id = first_id
+        locator._trapezoids = None
+        locator._regions = None
+        locator._dcel = None
+        locator._region_xy = region_xy
+        locator._node_xy = node_xy
+        locator._child_offsets = child_offsets
+        locator._child_index = child_index
+        locator._node_region = node_region
+        locator.bbox = bbox
+        locator._set_adjacency(neighbors, corners, vertex_xy)
+        locator._set_landmarks(landmarks, landmark_distances, landmark_spans)
+        locator._object_state = None
+        locator._measured_bytes = 0
+        locator.__starting_point = None
+        locator.__starting_triangle = None
+        return locator
+
+    @property
+    def regions(self) -> list[Triangle]:
+        if self._regions is None:
+            self._regions = [Triangle(*(Point(x, y) for x, y in tri)) for tri in self._region_xy.tolist()]
+            for i, region in enumerate(self._regions):
+                region.id = self.first_id + i
+        return self._regions
+
+    def local_id(self, triangle: Triangle) -> Optional[int]:
+        """Returns the index of TRIANGLE among the regions, or None if it is not one of them."""
+        if triangle.id is None or not 0 <= (i := triangle.id - self.first_id) < len(self._region_xy):
+            return None
+        return i
+
+    @property
+    def dcel(self) -> DCEL:
+        if self._dcel is None:
+            self._dcel = DCEL(self.regions, self._neighbors, self._corners, self._vertex_xy)
+            if len(self._landmarks):
+                self._dcel.landmarks = self._landmarks
+                self._dcel.landmark_distances = self._landmark_distances
+                self._dcel.landmark_spans = self._landmark_spans
+        return self._dcel
+
+    @property
+    def visibility_graph(self) -> VisibilityGraph:
+        if self._visibility is None:
+            self._visibility = VisibilityGraph(self._region_xy, self.dcel.neighbors)
+        return self._visibility
+
+    def _set_adjacency(self, neighbors: np.ndarray, corners: np.ndarray, vertex_xy: np.ndarray):
+        """Keeps the adjacency arrays of the DCEL for saving and for rebuilding it after a load."""
+        self._neighbors = neighbors
+        self._corners = corners
+        self._vertex_xy = vertex_xy
+
+    def _set_landmarks(self, landmarks: np.ndarray = None, distances: np.ndarray = None, spans: np.ndarray = None):
+        """Keeps the landmark arrays of the DCEL for saving; without landmarks they are empty."""
+        if landmarks is None:
+            landmarks = np.zeros(0, dtype=np.int32)
+            distances = np.zeros((0, 0), dtype=np.float32)
+            spans = np.zeros(0, dtype=np.float32)
+        self._landmarks = landmarks
+        self._landmark_distances = distances
+        self._landmark_spans = spans
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the memory the locator holds: its arrays and whatever Python objects it has materialized."""
+        arrays = [self._region_xy, self._neighbors, self._corners, self._vertex_xy, self._landmark_distances,
+                  self._landmark_spans]
+        if self._trapezoids is None:
+            arrays += [self._node_xy, self._child_offsets, self._child_index, self._node_region]
+        nbytes = sum(a.nbytes for a in arrays)
+        if self._trapezoids is not None:
+            nbytes += self._trapezoids.nbytes
+        if self._visibility is not None:
+            nbytes += self._visibility.nbytes
+        return nbytes + self._object_nbytes(arrays)
+
+    def _object_nbytes(self, arrays: list[np.ndarray]) -> int:
+        """Measures the region triangles and the DCEL, which grow as they are materialized.
+
+        Walking the objects costs about as much as creating them, so the result is kept
+        until another part of them is materialized.
+        """
+        state = (self._regions is not None, self._dcel is not None,
+                 self._dcel is not None and self._dcel._links is not None)
+        if self._object_state != state:
+            self._object_state = state
+            self._measured_bytes = _object_bytes([self._regions, self._dcel], arrays) if any(state) else 0
+        return self._measured_bytes
+
+    def _preprocess(self, regions: list[Triangle], outline=None, builder: str = 'incremental'):
         def process_boundary(__regions: list[Triangle], __outline=None):
            
             def add_bounding_triangle(poly: Polygon):
@@ -31,7 +236,11 @@ class SinglePolygonLocator:
                 bounding_tri = min_triangle.larger_bounding_triangle(poly.points)
                 if not bounding_tri:
                     return None, []
-                bounding_regions = bounding_tri.triangulate_polygon(poly.points)
+                bounding_regions = bounding_tri.triangulate_polygon([poly.points])
+                # The holes are filled too, so that the triangles cover the whole bounding
+                # triangle; like the rest of the boundary, they belong to no region.
+                for hole in poly.holes:
+                    bounding_regions += Polygon(hole).triangulation
                
                 return bounding_tri, bounding_regions
 
@@ -45,7 +254,7 @@ class SinglePolygonLocator:
             __frontier = []
 
             for region in __regions:
-                self.dag.add_node(region)
+                dag.add_node(region)
                 
                 if region.n < 3:
                     raise ValueError(f"Region with points: {region.points} has "
@@ -57,8 +266,8 @@ class SinglePolygonLocator:
                         triangles = region.triangulation
                         for triangle in triangles:
                             
-                            self.dag.add_node(triangle)
-                            self.dag.connect(triangle, region)
+                            dag.add_node(triangle)
+                            dag.connect(triangle, region)
                         
                             __frontier.append(triangle)
                     else:
@@ -139,10 +348,10 @@ class SinglePolygonLocator:
                 poly = calculate_bounding_polygon(p, affected_regions)
                 triangles = poly.triangulation
                 for triangle in triangles:
-                    self.dag.add_node(triangle)
+                    dag.add_node(triangle)
                     for j in affected_regions:
                         __region = __regions[j]
-                        self.dag.connect(triangle, __region)
+                        dag.connect(triangle, __region)
                     new_regions.append(triangle)
 
             for i in unaffected_regions:
@@ -150,26 +359,84 @@ class SinglePolygonLocator:
 
             return new_regions
 
-        self.dag = DirectedGraph()
+        dag = DirectedGraph()
 
       
-        self.regions = regions
+        self._regions = regions
 
   
         bounding_triangle, boundary = process_boundary(regions, outline)
         if bounding_triangle is None:
             raise BoundingTriangleCreationError("Could not calculate the bounding triangle.")
 
-        
-        self.boundary = boundary
+        if builder == 'incremental':
+            self._set_hierarchy(*HierarchyBuilder().build(regions, boundary, bounding_triangle.points))
+            return
 
         frontier = triangulate_regions(regions + boundary)
         while len(frontier) > 1:
             frontier = remove_independent_set(frontier)
+
+        self._freeze(dag)
         return
 
-    def locate(self, p: Point) -> Optional[Triangle]:
-        
+    def _freeze(self, dag: DirectedGraph):
+        """Flattens the finished search DAG into CSR arrays and lets go of its shapes.
+
+        Nodes are numbered breadth first from the root; the children of node k are
+        _child_index[_child_offsets[k]:_child_offsets[k + 1]] and its triangle is
+        _node_xy[k]. Polygon regions are folded into the triangles of their
+        triangulation, which then act as leaves for that region.
+        """
+        region_index = {id(r): i for i, r in enumerate(self.regions)}
+        root = dag.root()
+        order = [root]
+        index = {id(root): 0}
+        offsets = [0]
+        child_index = []
+        node_region = []
+        for node in order:
+            region = region_index.get(id(node), -1)
+            for child in dag.e[node]:
+                if not isinstance(child, Triangle):
+                    region = region_index[id(child)]
+                    continue
+                if id(child) not in index:
+                    index[id(child)] = len(order)
+                    order.append(child)
+                child_index.append(index[id(child)])
+            offsets.append(len(child_index))
+            node_region.append(region)
+
+        self._set_hierarchy(np.array([[p.np() for p in node.points] for node in order], dtype=np.float64),
+                            np.array(offsets, dtype=np.int32),
+                            np.array(child_index, dtype=np.int32),
+                            np.array(node_region, dtype=np.int32))
+
+    def _set_hierarchy(self, node_xy: np.ndarray, child_offsets: np.ndarray, child_index: np.ndarray,
+                       node_region: np.ndarray):
+        """Installs the CSR arrays of a finished hierarchy, see _freeze for their layout."""
+        self._node_xy = node_xy
+        self._child_offsets = child_offsets
+        self._child_index = child_index
+        self._node_region = node_region
+
+    def _set_regions(self):
+        """Keeps the region triangles as arrays for batch queries and for saving."""
+        self._region_xy = np.array([[p.np() for p in r.points] for r in self.regions], dtype=np.float64)
+        self.bbox = np.concatenate((self._region_xy.min(axis=(0, 1)), self._region_xy.max(axis=(0, 1))))
+
+    def locate(self, p: Point, hint: Triangle = None, max_steps: int = 64) -> Optional[Triangle]:
+        """Returns the region triangle containing p, or None.
+
+        Given a HINT triangle near p, the DCEL is walked from it first, and the search
+        structure is only consulted if the walk takes more than MAX_STEPS steps or
+        leaves the polygon.
+        """
+        if hint is not None and (start := self.local_id(hint)) is not None:
+            if (i := self.dcel.walk(start, p, max_steps)) is not None:
+                return self.regions[i]
+
         polygon, valid = self.annotated_locate(p)
 
      
@@ -179,30 +446,86 @@ class SinglePolygonLocator:
         return polygon
 
     def annotated_locate(self, p: Point) -> (Optional[Triangle], bool):
- 
-        curr = self.dag.root()
-        if not curr.contains_point(p):
+        if self._trapezoids is not None:
+            if (region := self._trapezoids.locate(p.x, p.y)) < 0:
+                return None, False
+            return self.regions[region], True
+
+        def contains(node: int) -> bool:
+            return triangle_contains(node_xy[node].tolist(), p.x, p.y)
+
+        node_xy, offsets, child_index = self._node_xy, self._child_offsets, self._child_index
+        if not contains(0):
             return None, False
 
-        children = self.dag.e[curr]
+        curr = 0
+        children = child_index[offsets[0]:offsets[1]].tolist()
         while children:
-            for region in children:
-                if region.contains_point(p):
-                    curr = region
+            for child in children:
+                if contains(child):
+                    curr = child
                     break
+            else:
+                return None, False
 
-            children = self.dag.e[curr]
+            children = child_index[offsets[curr]:offsets[curr + 1]].tolist()
 
-        
-        return curr, curr in self.regions
-
-    def find_path(self, tri_1: Triangle, tri_2: Triangle) -> Optional[list[int]]:
-        if not (hash(tri_1) in self.triangles and hash(tri_2) in self.triangles):
+        if (region := self._node_region[curr]) < 0:
+            return None, False
+        return self.regions[region], True
+
+    def locate_many(self, xy: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Locates an (N, 2) array of points, moving all of them down the hierarchy together.
+
+        Returns the ids of the containing triangles and a mask that is False for points
+        outside the polygon, whose id entries are meaningless.
+        """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        if self._trapezoids is not None:
+            regions = self._trapezoids.locate_many(xy)
+            valid = regions >= 0
+            return np.where(valid, self.first_id + regions.astype(np.int64), 0), valid
+
+        current = np.zeros(len(xy), dtype=np.int32)
+        active = triangles_contain(self._node_xy[0], xy)
+        valid = active.copy()
+
+        while active.any():
+            idx = np.flatnonzero(active)
+            start = self._child_offsets[current[idx]]
+            count = self._child_offsets[current[idx] + 1] - start
+            slots = np.arange(max(count.max(), 1))
+            present = slots < count[:, None]
+            kids = np.where(present, self._child_index[np.where(present, start[:, None] + slots, 0)], 0)
+            inside = present & triangles_contain(self._node_xy[kids], xy[idx, None, :])
+            found = inside.any(axis=1)
+
+            # Points whose node has no children sit in a leaf. Points that no child
+            # claims fell through a numerical crack and are reported as not located.
+            stuck = ~found & (count > 0)
+            valid[idx[stuck]] = False
+            active[idx[~found]] = False
+
+            idx, kids, inside = idx[found], kids[found], inside[found]
+            current[idx] = kids[np.arange(len(idx)), inside.argmax(axis=1)]
+
+        regions = self._node_region[current]
+        valid &= regions >= 0
+        ids = np.where(valid, self.first_id + regions.astype(np.int64), 0)
+        return ids, valid
+
+    def find_path(self, tri_1: Triangle, tri_2: Triangle, start: Point = None,
+                  end: Point = None) -> Optional[list[int]]:
+        """Returns the local ids of the triangles on a channel from TRI_1 to TRI_2.
+
+        The channel is searched with DCEL.astar, towards END from START if given.
+        """
+        if (first := self.local_id(tri_1)) is None or (goal := self.local_id(tri_2)) is None:
             return None
-        return self.dcel.bfs(tri_1, tri_2)
+        return self.dcel.astar(first, goal, start, end)
 
-    def funnel(self, triangle_hashes: list[int], start: Point, end: Point):
-        return self.dcel.funnel(triangle_hashes, start, end)
+    def funnel(self, triangle_ids: list[int], start: Point, end: Point) -> np.ndarray:
+        return self.dcel.funnel(triangle_ids, start, end)
 
     def set_first_point(self, point: Point, triangle: Triangle = None):
         if triangle is not None:
@@ -224,87 +547,421 @@ class SinglePolygonLocator:
         self.__starting_point = None
         return False
 
-    def get_shortest_path(self, end_point: Point):
+    def get_shortest_path(self, end_point: Point) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        """Returns the edges crossed from the first point to END_POINT and the path between them.
+
+        The crossed edges come as a (K, 2, 2) array of their left and right ends, the path
+        as an (M, 2) array. None without a first point or if END_POINT is not reached.
+        """
         if self.__starting_point is None:
             return None
         if (tri := self.locate(end_point)) is None:
             return None
 
-        if (tri_path := self.dcel.bfs(self.__starting_triangle, tri)) is None:
+        if self.path_strategy == 'visibility':
+            return self._visibility_path(end_point, tri)
+
+        if (tri_path := self.find_path(self.__starting_triangle, tri, self.__starting_point, end_point)) is None:
             return None
 
-        res = self.dcel.funnel(tri_path, self.__starting_point, end_point)
+        dcel = self.dcel
+        portals = dcel.portals(tri_path)
+        start = self.__starting_point
+        path = funnel_path(dcel.vertex_xy, portals, (start.x, start.y), (end_point.x, end_point.y), dcel.trace)
 
         self.__starting_triangle = None
         self.__starting_point = None
-        return res
+        return dcel.vertex_xy[portals], path
+
+    def _visibility_path(self, end_point: Point, end_triangle: Triangle):
+        """Like get_shortest_path, from the VisibilityGraph; no edges are crossed on the way."""
+        start, start_triangle = self.__starting_point, self.__starting_triangle
+        self.__starting_triangle = None
+        self.__starting_point = None
+        if (found := self.visibility_graph.shortest_path((start.x, start.y), self.local_id(start_triangle),
+                                                         (end_point.x, end_point.y),
+                                                         self.local_id(end_triangle))) is None:
+            return None
+        return np.zeros((0, 2, 2)), found[0]
+
+    def shortest_path_map(self, source: Point) -> Optional[ShortestPathMap]:
+        """Returns the ShortestPathMap of SOURCE, or None if SOURCE is not located."""
+        if (triangle := self.locate(source)) is None:
+            return None
+        return ShortestPathMap(self.dcel, self.local_id(triangle), source)
+
+    def shortest_paths_from(self, source: Point, targets) -> Optional[tuple[list[Optional[np.ndarray]], np.ndarray]]:
+        """Returns the shortest paths from SOURCE to each of TARGETS, Points or an (N, 2) array.
+
+        The ShortestPathMap of SOURCE is swept once and the targets are located together,
+        so each path only costs the funnel of its triangle. Returns a list with an (M, 2)
+        array per target, None for targets that are not located or not connected to
+        SOURCE, and the lengths of the paths, inf for those. None if SOURCE is not located.
+        """
+        if (path_map := self.shortest_path_map(source)) is None:
+            return None
+        xy = as_xy(targets)
+        ids, valid = self.locate_many(xy)
+        paths = []
+        lengths = np.full(len(xy), np.inf)
+        for k, (i, found, (x, y)) in enumerate(zip(ids.tolist(), valid.tolist(), xy.tolist())):
+            if found and (result := path_map.path_to(i - self.first_id, Point(x, y))) is not None:
+                paths.append(result[0])
+                lengths[k] = result[1]
+            else:
+                paths.append(None)
+        return paths, lengths
 
     pass
 
 
+def _build_locator(region: Polygon, engine: str, first_id: int = 0, landmarks: int = 0) -> Optional[SinglePolygonLocator]:
+    """Triangulates one outline and builds its locator, None if it has no bounding triangle."""
+    try:
+        return SinglePolygonLocator(region.triangulation, region, engine=engine, first_id=first_id,
+                                    landmarks=landmarks)
+    except BoundingTriangleCreationError:
+        return None
+
+
+def _build_locators_in_pool(regions: list[Polygon], engine: str, first_ids: list[int], workers: int,
+                            landmarks: int = 0):
+    """Yields the locators of REGIONS in order while a process pool builds them.
+
+    The largest outlines are submitted first so that no worker is left with a big
+    polygon at the end.
+    """
+    with ProcessPoolExecutor(workers) as pool:
+        by_size = sorted(range(len(regions)), key=lambda i: -regions[i].n)
+        futures = [None] * len(regions)
+        for i in by_size:
+            futures[i] = pool.submit(_build_locator, regions[i], engine, first_ids[i], landmarks)
+        for future in futures:
+            yield future.result()
+        pass
+
+
 class MultiPolygonLocator:
-    def __init__(self) -> None:
-        self.locators = set()
-        self.all_triangles: dict[int, Triangle] = dict()
-        self.triangle_owners: dict[int, SinglePolygonLocator] = dict()
+    def __init__(self, engine: str = 'kirkpatrick', lazy: bool = False, max_triangles: int = None,
+                 max_bytes: int = None, landmarks: int = 0) -> None:
+        """ENGINE picks the point location structure of every polygon, see SinglePolygonLocator.
+
+        Every polygon owns a block of triangle ids starting at a multiple of 2**ID_BITS,
+        so the owner of a triangle follows from its id alone.
+
+        With LAZY, add_regions only keeps the outlines and their bounding boxes, and the
+        locator of a polygon is built the first time a query lands in its box. Built
+        locators are kept in a LocatorCache that evicts the least recently used ones once
+        they hold more than MAX_TRIANGLES triangles or roughly MAX_BYTES bytes.
+
+        LANDMARKS is passed on to every SinglePolygonLocator.
+        """
+        if not lazy and (max_triangles is not None or max_bytes is not None):
+            raise ValueError("A memory budget needs lazy=True.")
+
+        self.engine = engine
+        self.landmarks = landmarks
+        self.locators: list[SinglePolygonLocator] = []
+        self._first_ids: list[int] = []
+        self._all_triangles: Optional[dict[int, Triangle]] = None
+        self._triangle_owners: Optional[dict[int, SinglePolygonLocator]] = None
+        self._triangle_keys: Optional[set[frozenset[Point]]] = None
+        self._index: Optional[STRTree] = None
+
+        self._cache: Optional[LocatorCache] = LocatorCache(max_triangles, max_bytes) if lazy else None
+        self._outlines: list[Polygon] = []
+        self._bboxes: list[tuple[float, float, float, float]] = []
+        self._failed: set[int] = set()
 
         self.__starting_point = None
         self.__starting_triangle = None
         self.__current_locator = None
+        self.__current_index = None
         pass
+
+    @property
+    def lazy(self) -> bool:
+        return self._cache is not None
+
+    def _count(self) -> int:
+        return len(self._outlines) if self.lazy else len(self.locators)
+
+    def _next_block(self) -> int:
+        return (self._first_ids[-1] >> ID_BITS) + 1 if self._first_ids else 0
+
+    def _position(self, triangle: Triangle) -> Optional[int]:
+        """Returns the index of the polygon whose id block holds TRIANGLE, or None."""
+        if triangle.id is None or (i := bisect_right(self._first_ids, triangle.id) - 1) < 0:
+            return None
+        return i
+
+    def _locator(self, i: int) -> Optional[SinglePolygonLocator]:
+        """Returns the locator of polygon i, building it first in lazy mode.
+
+        Returns None for lazy polygons without a bounding triangle.
+        """
+        if not self.lazy:
+            return self.locators[i]
+        if (locator := self._cache.get(i)) is not None:
+            return locator
+        if i in self._failed:
+            return None
+
+        # A fresh outline, so that its cached triangulation goes away with the locator.
+        outline = Polygon(self._outlines[i].points, self._outlines[i].holes)
+        if (locator := _build_locator(outline, self.engine, self._first_ids[i], self.landmarks)) is None:
+            self._failed.add(i)
+            return None
+        self._cache.put(i, locator, len(locator.regions), locator.nbytes)
+        return locator
+
+    @property
+    def all_triangles(self) -> dict[int, Triangle]:
+        """Maps triangle ids to triangles. Built on first use, which builds all lazy locators."""
+        if self._all_triangles is None:
+            self._index_triangles()
+        return self._all_triangles
+
+    @property
+    def triangle_owners(self) -> dict[int, SinglePolygonLocator]:
+        if self._triangle_owners is None:
+            self._index_triangles()
+        return self._triangle_owners
+
+    def _index_triangles(self):
+        """Rebuilds the triangle maps from the polygon locators, building all lazy ones."""
+        self._all_triangles = dict()
+        self._triangle_owners = dict()
+        for i in range(self._count()):
+            if (locator := self._locator(i)) is None:
+                continue
+            for triangle in locator.regions:
+                self._all_triangles[triangle.id] = triangle
+                self._triangle_owners[triangle.id] = locator
+        return
+
+    def save(self, path):
+        """Writes the built locators to a file that MultiPolygonLocator.load can memory map.
+
+        In lazy mode every polygon is built first; ones without a bounding triangle are left out.
+        """
+        if self.engine != 'kirkpatrick' or any(locator.engine != 'kirkpatrick' for locator in self.locators):
+            raise ValueError("Only locators built with the kirkpatrick engine can be saved.")
+        built = [(first_id, self._locator(i)) for i, first_id in enumerate(self._first_ids)]
+        first_ids = [first_id for first_id, locator in built if locator is not None]
+        locators = [locator for _, locator in built if locator is not None]
+
+        def stack(name: str, dtype) -> np.ndarray:
+            parts = [getattr(locator, name) for locator in locators]
+            return np.concatenate(parts).astype(dtype, copy=False) if parts else np.zeros(0, dtype)
+
+        def offsets(name: str) -> np.ndarray:
+            return np.cumsum([0] + [len(getattr(locator, name)) for locator in locators], dtype=np.int64)
+
+        arrays = {
+            'region_xy': stack('_region_xy', np.float64).reshape(-1, 3, 2),
+            'first_ids': np.array(first_ids, dtype=np.int64),
+            'region_offsets': offsets('_region_xy'),
+            'node_xy': stack('_node_xy', np.float64).reshape(-1, 3, 2),
+            'node_region': stack('_node_region', np.int32),
+            'node_offsets': offsets('_node_xy'),
+            'child_offsets': stack('_child_offsets', np.int32),
+            'child_index': stack('_child_index', np.int32),
+            'child_index_offsets': offsets('_child_index'),
+            'bbox': np.array([locator.bbox for locator in locators], dtype=np.float64).reshape(-1, 4),
+            'neighbors': stack('_neighbors', np.int32).reshape(-1, 3),
+            'corners': stack('_corners', np.int32).reshape(-1, 3),
+            'vertex_xy': stack('_vertex_xy', np.float64).reshape(-1, 2),
+            'vertex_offsets': offsets('_vertex_xy'),
+            'landmarks': stack('_landmarks', np.int32),
+            'landmark_offsets': offsets('_landmarks'),
+            'landmark_distances': np.concatenate([np.zeros(0, np.float32)] + [
+                locator._landmark_distances.ravel() for locator in locators]).astype(np.float32, copy=False),
+            'landmark_spans': stack('_landmark_spans', np.float32),
+            'landmark_span_offsets': offsets('_landmark_spans'),
+        }
+        meta = {'locators': len(locators), 'engine': self.engine, 'landmarks': self.landmarks}
+        storage.write_arrays(path, arrays, LOCATOR_FORMAT_VERSION, meta)
+        return
+
+    @classmethod
+    def load(cls, path) -> 'MultiPolygonLocator':
+        """Loads locators written by save without rebuilding them.
+
+        The coordinate and index arrays stay memory mapped, so loading costs time
+        proportional to the number of polygons rather than the number of triangles.
+        The engine and landmark count the locators were saved with are restored, so
+        polygons added later are built the same way.
+        """
+        meta, arrays = storage.read_arrays(path, LOCATOR_FORMAT_VERSION)
+        regions = arrays['region_offsets'].tolist()
+        nodes = arrays['node_offsets'].tolist()
+        edges = arrays['child_index_offsets'].tolist()
+        landmarks = arrays['landmark_offsets'].tolist()
+        spans = arrays['landmark_span_offsets'].tolist()
+        vertices = arrays['vertex_offsets'].tolist()
+        distances = 0
+
+        locator = cls(engine=meta['engine'], landmarks=meta['landmarks'])
+        locator._first_ids = arrays['first_ids'].tolist()
+        for i in range(meta['locators']):
+            # Every locator with landmarks has a distance to each of them for every region.
+            count, size = landmarks[i + 1] - landmarks[i], regions[i + 1] - regions[i]
+            landmark_distances = arrays['landmark_distances'][distances:distances + count * size].reshape(count, size)
+            distances += count * size
+            # Each polygon's child offsets hold one more entry than it has nodes.
+            locator.locators.append(SinglePolygonLocator._from_arrays(
+                locator._first_ids[i],
+                arrays['region_xy'][regions[i]:regions[i + 1]],
+                arrays['node_xy'][nodes[i]:nodes[i + 1]],
+                arrays['child_offsets'][nodes[i] + i:nodes[i + 1] + i + 1],
+                arrays['child_index'][edges[i]:edges[i + 1]],
+                arrays['node_region'][nodes[i]:nodes[i + 1]],
+                arrays['bbox'][i],
+                arrays['neighbors'][regions[i]:regions[i + 1]],
+                arrays['corners'][regions[i]:regions[i + 1]],
+                arrays['vertex_xy'][vertices[i]:vertices[i + 1]],
+                arrays['landmarks'][landmarks[i]:landmarks[i + 1]] if count else None,
+                landmark_distances,
+                arrays['landmark_spans'][spans[i]:spans[i + 1]]))
+
+        if locator.locators:
+            locator._index = STRTree(arrays['bbox'])
+        return locator
     
    
-    def add_regions(self, region_outlines: Iterable[Polygon]) -> Optional[set[int]]:
-        tri_triangles = {**self.all_triangles}
-        tri_locators = {**self.triangle_owners}
+    def add_regions(self, region_outlines: Iterable[Polygon], workers: int = None) -> Optional[set[int]]:
+        """Builds a locator for every outline and returns the indices of the skipped ones.
+
+        Returns None, leaving the locator unchanged, if two polygons share a triangle.
+        With WORKERS > 1 the polygons are triangulated and their locators built in a
+        process pool; the results are merged in order, exactly as in the serial case.
+
+        In lazy mode nothing is triangulated here, so no polygon is skipped and shared
+        triangles go undetected; polygons without a bounding triangle are never located.
+        """
+        block = self._next_block()
+        if self.lazy:
+            for region in region_outlines:
+                self._outlines.append(region)
+                self._first_ids.append(block << ID_BITS)
+                block += 1
+                xy = region.xy
+                self._bboxes.append((*xy.min(axis=0).tolist(), *xy.max(axis=0).tolist()))
+            if self._bboxes:
+                self._index = STRTree(np.array(self._bboxes, dtype=np.float64))
+            self._all_triangles = None
+            self._triangle_owners = None
+            return set()
+
+        # Polygon i of this call gets the id block BLOCK + i, whether it is skipped or not.
+        region_outlines = list(region_outlines)
+        first_ids = [(block + i) << ID_BITS for i in range(len(region_outlines))]
+        if self._triangle_keys is None:
+            self._triangle_keys = {frozenset(t.points) for locator in self.locators for t in locator.regions}
+        triangle_keys = set(self._triangle_keys)
+        locators = [*self.locators]
+        locator_first_ids = [*self._first_ids]
+
+        if workers is not None and workers > 1:
+            built = _build_locators_in_pool(region_outlines, self.engine, first_ids, workers, self.landmarks)
+        else:
+            built = (_build_locator(region, self.engine, first_id, self.landmarks)
+                     for region, first_id in zip(region_outlines, first_ids))
 
         skipped = set()
-        for i, region in enumerate(region_outlines):
-
-            triangulation = region.triangulation
-            try:
-                locator = SinglePolygonLocator(triangulation, region)
-            except BoundingTriangleCreationError:
+        for i, locator in enumerate(built):
+            if locator is None:
                 skipped.add(i)
                 continue
-            for triangle in triangulation:
-                if (h := hash(triangle)) in tri_triangles:
+            for triangle in locator.regions:
+                if (key := frozenset(triangle.points)) in triangle_keys:
                     return None
-                tri_triangles[h] = triangle
-                tri_locators[h] = locator
+                triangle_keys.add(key)
             else:
-                self.locators.add(locator)
+                locators.append(locator)
+                locator_first_ids.append(first_ids[i])
             pass
 
-        self.all_triangles = tri_triangles
-        self.triangle_owners = tri_locators
+        self._all_triangles = None
+        self._triangle_owners = None
+        self._triangle_keys = triangle_keys
+        self.locators = locators
+        self._first_ids = locator_first_ids
+        if locators:
+            self._index = STRTree(np.array([locator.bbox for locator in locators]))
         return skipped
 
     def locate(self, p: Point, previous_triangle: Triangle = None) -> Optional[Triangle]:
+        """Returns the triangle containing p, or None.
+
+        With PREVIOUS_TRIANGLE the search stays in the polygon that owns it and starts
+        with a walk from it, which is close to O(1) for nearby consecutive queries.
+        """
         if previous_triangle is not None:
-            if (locator := self.triangle_owners.get(hash(previous_triangle))) is None:
+            if (locator := self._owner(previous_triangle)) is None:
                 return None
-            return locator.locate(p)
-        for locator in self.locators:
+            return locator.locate(p, hint=previous_triangle)
+        return self._locate(p)[2]
+
+    def _owner(self, triangle: Triangle) -> Optional[SinglePolygonLocator]:
+        """Returns the locator that owns TRIANGLE, or None."""
+        if (i := self._position(triangle)) is None or (locator := self._locator(i)) is None:
+            return None
+        return locator if locator.local_id(triangle) is not None else None
+
+    def _locate(self, p: Point) -> (Optional[int], Optional[SinglePolygonLocator], Optional[Triangle]):
+        """Returns the triangle containing p together with the locator that owns it and its index."""
+        if self._index is None:
+            return None, None, None
+        for i in self._index.query(p.x, p.y):
+            if (locator := self._locator(i)) is None:
+                continue
             if (triangle := locator.locate(p)) is not None:
-                return triangle
-        return None
+                return i, locator, triangle
+        return None, None, None
+
+    def locate_many(self, xy: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Locates an (N, 2) array of points, see SinglePolygonLocator.locate_many.
+
+        Each locator only receives the points that fall inside its bounding box.
+        """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        ids = np.zeros(len(xy), dtype=np.int64)
+        valid = np.zeros(len(xy), dtype=bool)
+        if self._index is None:
+            return ids, valid
+
+        points, owners = self._index.query_points(xy)
+        by_owner = np.argsort(owners, kind='stable')
+        points, owners = points[by_owner], owners[by_owner]
+        bounds = np.flatnonzero(np.diff(owners, prepend=-1, append=self._count()))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            pending = points[start:end]
+            pending = pending[~valid[pending]]
+            if not len(pending) or (locator := self._locator(owners[start])) is None:
+                continue
+            found_ids, found = locator.locate_many(xy[pending])
+            ids[pending[found]] = found_ids[found]
+            valid[pending[found]] = True
+        return ids, valid
 
     def set_first_point(self, point: Point) -> bool:
 
         self.__starting_point = None
         self.__starting_triangle = None
         self.__current_locator = None
+        self.__current_index = None
 
-        if (tri := self.locate(point)) is None:
+        i, locator, tri = self._locate(point)
+        if tri is None:
             return False
-        h = hash(tri)
-        locator = self.triangle_owners[h]
 
         if locator.set_first_point(point, tri):
             self.__starting_point = point
             self.__starting_triangle = tri
             self.__current_locator = locator
+            self.__current_index = i
             return True
         return False
 
@@ -312,19 +969,30 @@ class MultiPolygonLocator:
         return not not self.__starting_point
 
     def get_shortest_path(self, end_point: Point):
-        if (tri := self.locate(end_point)) is None:
+        i, _, tri = self._locate(end_point)
+        if tri is None:
             return None
 
-        h = hash(tri)
-        locator = self.triangle_owners[h]
-
-        if locator is not self.__current_locator:
+        # Compared by index, as a lazy locator may have been evicted and rebuilt since;
+        # the one holding the starting point is still referenced here.
+        if i != self.__current_index:
             return None
 
+        locator = self.__current_locator
         self.__starting_point = None
         self.__starting_triangle = None
         self.__current_locator = None
+        self.__current_index = None
 
         return locator.get_shortest_path(end_point)
+
+    def shortest_paths_from(self, source: Point, targets) -> Optional[tuple[list[Optional[np.ndarray]], np.ndarray]]:
+        """Returns the shortest paths from SOURCE to TARGETS, see SinglePolygonLocator.shortest_paths_from.
+
+        Targets outside the polygon that holds SOURCE get no path.
+        """
+        if (locator := self._locate(source)[1]) is None:
+            return None
+        return locator.shortest_paths_from(source, targets)
     pass
         
@@ -0,0 +1,77 @@
+import json
+import struct
+
+import numpy as np
+
+
+MAGIC = b'CGPLOC\x00\x00'
+ALIGNMENT = 64
+
+# Magic, format version and header length, followed by the JSON header.
+_PREFIX = struct.Struct('<8sII')
+
+
+class StorageFormatError(Exception):
+    pass
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_arrays(path, arrays: dict[str, np.ndarray], version: int, meta: dict = None):
+    """Writes named arrays to a single binary file that read_arrays can memory map.
+
+    The file starts with a small JSON header describing the dtype, shape and offset of
+    every array; the raw array buffers follow, each aligned to ALIGNMENT bytes.
+    """
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+
+    # Offsets are relative to the end of the header, whose size depends on them.
+    entries = {}
+    offset = 0
+    for name, a in arrays.items():
+        entries[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset}
+        offset = _aligned(offset + a.nbytes)
+    header = json.dumps({'meta': meta or {}, 'arrays': entries}).encode('utf-8')
+    data_start = _aligned(_PREFIX.size + len(header))
+
+    with open(path, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, version, len(header)))
+        f.write(header)
+        for name, a in arrays.items():
+            f.seek(data_start + entries[name]['offset'])
+            f.write(a.tobytes())
+        f.truncate(data_start + offset)
+    return
+
+
+def read_arrays(path, version: int) -> tuple[dict, dict[str, np.ndarray]]:
+    """Memory maps a file written by write_arrays and returns its metadata and arrays.
+
+    All arrays are read-only views into one shared mapping, so processes that load the
+    same file share its pages.
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise StorageFormatError(f"{path} is too short to be a locator file.")
+        magic, file_version, header_len = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise StorageFormatError(f"{path} is not a locator file.")
+        if file_version != version:
+            raise StorageFormatError(f"{path} has format version {file_version}, "
+                                     f"expected {version}.")
+        header = json.loads(f.read(header_len).decode('utf-8'))
+
+    data_start = _aligned(_PREFIX.size + header_len)
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype = np.dtype(entry['dtype'])
+        shape = tuple(entry['shape'])
+        start = data_start + entry['offset']
+        count = int(np.prod(shape, dtype=np.int64))
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(shape)
+    return header['meta'], arrays
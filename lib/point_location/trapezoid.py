@@ -0,0 +1,272 @@
+from random import Random
+from typing import Optional
+
+import numpy as np
+
+from lib.point_location.geo.shapes import Point, Shape2d
+
+
+_LEAF, _X, _Y = 0, 1, 2
+
+
+class _Node:
+    """Search structure node. X nodes split on a point, Y nodes on a segment.
+
+    For X nodes LEFT/RIGHT are the sides of the point, for Y nodes they hold the
+    subtrees above/below the segment. Leaves keep their trapezoid in KEY.
+    """
+    __slots__ = ('kind', 'key', 'left', 'right')
+
+    def __init__(self, kind: int, key, left=None, right=None):
+        self.kind = kind
+        self.key = key
+        self.left = left
+        self.right = right
+
+
+class _Trapezoid:
+    __slots__ = ('top', 'bottom', 'leftp', 'rightp', 'ul', 'll', 'ur', 'lr', 'node')
+
+    def __init__(self, top: int, bottom: int, leftp: int, rightp: int):
+        self.top = top
+        self.bottom = bottom
+        self.leftp = leftp
+        self.rightp = rightp
+        self.ul = self.ll = self.ur = self.lr = None
+        self.node = _Node(_LEAF, self)
+
+
+def _link(left: _Trapezoid, right: _Trapezoid):
+    """Connects two trapezoids if they touch along the wall through left.rightp."""
+    if left.rightp != right.leftp:
+        return
+    if left.top == right.top:
+        left.ur = right
+        right.ul = left
+    if left.bottom == right.bottom:
+        left.lr = right
+        right.ll = left
+
+
+class TrapezoidalMap:
+    """Point location over a planar subdivision with a randomized incremental trapezoidal map.
+
+    The edges of REGIONS are inserted in random order (Seidel, Mulmuley), which gives an
+    expected O(n log n) build and O(log n) query. Points are compared lexicographically,
+    which acts as a symbolic shear, so shared x coordinates and vertical edges need no
+    special treatment. The finished search DAG is frozen into flat arrays; every leaf
+    reports the index of the region below the top edge of its trapezoid, or -1.
+    """
+
+    def __init__(self, regions: list[Shape2d], seed: Optional[int] = None):
+        point_ids: dict[Point, int] = {}
+        xy: list[tuple[float, float]] = []
+        for region in regions:
+            for p in region.points:
+                if p not in point_ids:
+                    point_ids[p] = len(xy)
+                    xy.append((p.x, p.y))
+
+        # Segments run from their lexicographically smaller endpoint to the larger one.
+        segment_ids: dict[tuple[int, int], int] = {}
+        segments: list[tuple[int, int]] = []
+        below: list[int] = []
+        for r, region in enumerate(regions):
+            ids = [point_ids[p] for p in region.points]
+            area = self._signed_area(ids, xy)
+            for a, b in zip(ids, ids[1:] + ids[:1]):
+                key = (a, b) if xy[a] < xy[b] else (b, a)
+                if (s := segment_ids.get(key)) is None:
+                    s = segment_ids[key] = len(segments)
+                    segments.append(key)
+                    below.append(-1)
+                # The interior lies to the left of a counter-clockwise edge. Degenerate
+                # regions have no interior and must not claim either side.
+                if area and (key[0] == a) != (area > 0):
+                    below[s] = r
+
+        xs = [p[0] for p in xy]
+        ys = [p[1] for p in xy]
+        margin = max(max(xs) - min(xs), max(ys) - min(ys), 1.0)
+        corners = [(min(xs) - margin, min(ys) - margin), (max(xs) + margin, min(ys) - margin),
+                   (min(xs) - margin, max(ys) + margin), (max(xs) + margin, max(ys) + margin)]
+        bl, br, tl, tr = range(len(xy), len(xy) + 4)
+        xy.extend(corners)
+        top, bottom = len(segments), len(segments) + 1
+        segments.extend(((tl, tr), (bl, br)))
+        below.extend((-1, -1))
+
+        self._points = xy
+        self._segments = segments
+        first = _Trapezoid(top, bottom, bl, tr)
+        self._root = first.node
+        order = list(range(top))
+        Random(seed).shuffle(order)
+        for s in order:
+            self._insert(s)
+
+        self._freeze(below)
+
+    @staticmethod
+    def _signed_area(ids: list[int], xy: list[tuple[float, float]]) -> float:
+        return sum(xy[a][0] * xy[b][1] - xy[b][0] * xy[a][1] for a, b in zip(ids, ids[1:] + ids[:1]))
+
+    def _orientation(self, s: int, c: int) -> float:
+        """Positive if point c lies above segment s."""
+        (ax, ay), (bx, by) = self._points[self._segments[s][0]], self._points[self._segments[s][1]]
+        cx, cy = self._points[c]
+        return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+    def _find(self, s: int) -> _Trapezoid:
+        """Returns the trapezoid that segment s enters just right of its left endpoint."""
+        p, q = self._segments[s]
+        node = self._root
+        while node.kind != _LEAF:
+            if node.kind == _X:
+                node = node.left if self._points[p] < self._points[node.key] else node.right
+            else:
+                # Segments sharing their left endpoint are ordered by slope.
+                o = self._orientation(node.key, p) or self._orientation(node.key, q)
+                node = node.left if o > 0 else node.right
+        return node.key
+
+    def _insert(self, s: int):
+        p, q = self._segments[s]
+        crossed = [self._find(s)]
+        while self._points[q] > self._points[crossed[-1].rightp]:
+            last = crossed[-1]
+            crossed.append(last.lr if self._orientation(s, last.rightp) > 0 else last.ur)
+
+        first, last = crossed[0], crossed[-1]
+        left = _Trapezoid(first.top, first.bottom, first.leftp, p) if first.leftp != p else None
+        right = _Trapezoid(last.top, last.bottom, q, last.rightp) if last.rightp != q else None
+
+        # Pieces above (below) s merge across a wall that s cuts off, i.e. one whose
+        # point lies below (above) s.
+        uppers, lowers = [], []
+        for j, d in enumerate(crossed):
+            wall = crossed[j - 1].rightp if j else p
+            if not j or self._orientation(s, wall) > 0:
+                if uppers:
+                    uppers[-1].rightp = wall
+                uppers.append(_Trapezoid(d.top, s, wall, q))
+            if not j or self._orientation(s, wall) < 0:
+                if lowers:
+                    lowers[-1].rightp = wall
+                lowers.append(_Trapezoid(s, d.bottom, wall, q))
+
+            sub = _Node(_Y, s, uppers[-1].node, lowers[-1].node)
+            if j == 0 and left:
+                sub = _Node(_X, p, left.node, sub)
+            if j == len(crossed) - 1 and right:
+                sub = _Node(_X, q, sub, right.node)
+            d.node.kind, d.node.key, d.node.left, d.node.right = sub.kind, sub.key, sub.left, sub.right
+
+        # Rewire neighbors: the new trapezoids among themselves and with the old neighbors
+        # of the trapezoids they replace.
+        removed = set(map(id, crossed))
+        created = [t for t in (left, right) if t] + uppers + lowers
+        touched = []
+        for d in crossed:
+            for t in (d.ul, d.ll, d.ur, d.lr):
+                if t is not None and id(t) not in removed:
+                    touched.append(t)
+                    for attr in ('ul', 'll', 'ur', 'lr'):
+                        if id(getattr(t, attr)) in removed:
+                            setattr(t, attr, None)
+
+        ending: dict[int, list[_Trapezoid]] = {}
+        for t in created + touched:
+            ending.setdefault(t.rightp, []).append(t)
+        for t in created + touched:
+            for other in ending.get(t.leftp, ()):
+                _link(other, t)
+        return
+
+    def _freeze(self, below: list[int]):
+        """Numbers the DAG nodes from the root and stores them in flat arrays.
+
+        All leaves of the same region share one node.
+        """
+        index = {id(self._root): 0}
+        nodes = [self._root]
+        face_nodes: dict[int, int] = {}
+        kind, key, left, right = [], [], [], []
+        for node in nodes:
+            if node.kind == _LEAF:
+                kind.append(_LEAF)
+                key.append(below[node.key.top])
+                left.append(-1)
+                right.append(-1)
+                continue
+
+            children = []
+            for child in (node.left, node.right):
+                if child.kind == _LEAF:
+                    face = below[child.key.top]
+                    if face not in face_nodes:
+                        face_nodes[face] = index[id(child)] = len(nodes)
+                        nodes.append(child)
+                    children.append(face_nodes[face])
+                    continue
+                if id(child) not in index:
+                    index[id(child)] = len(nodes)
+                    nodes.append(child)
+                children.append(index[id(child)])
+            kind.append(node.kind)
+            key.append(node.key)
+            left.append(children[0])
+            right.append(children[1])
+
+        self._kind = np.array(kind, dtype=np.int8)
+        self._key = np.array(key, dtype=np.int32)
+        self._left = np.array(left, dtype=np.int32)
+        self._right = np.array(right, dtype=np.int32)
+        self._xy = np.array(self._points, dtype=np.float64)
+        self._segment_ends = np.array(self._segments, dtype=np.int32)
+        del self._root, self._points, self._segments
+
+    def locate(self, x: float, y: float) -> int:
+        """Returns the index of the region containing (x, y), or -1."""
+        kind, key, left, right, xy, ends = self._kind, self._key, self._left, self._right, self._xy, self._segment_ends
+        node = 0
+        while (k := kind[node]) != _LEAF:
+            if k == _X:
+                vx, vy = xy[key[node]].tolist()
+                node = left[node] if x < vx or (x == vx and y < vy) else right[node]
+            else:
+                a, b = ends[key[node]].tolist()
+                (ax, ay), (bx, by) = xy[a].tolist(), xy[b].tolist()
+                above = (bx - ax) * (y - ay) - (by - ay) * (x - ax) > 0
+                node = left[node] if above else right[node]
+        return int(key[node])
+
+    def locate_many(self, xy: np.ndarray) -> np.ndarray:
+        """Returns the region index of every point of an (N, 2) array, -1 outside all regions."""
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        current = np.zeros(len(xy), dtype=np.int32)
+        while True:
+            kinds = self._kind[current]
+            for k in (_X, _Y):
+                idx = np.flatnonzero(kinds == k)
+                if not len(idx):
+                    continue
+                nodes = current[idx]
+                x, y = xy[idx, 0], xy[idx, 1]
+                if k == _X:
+                    v = self._xy[self._key[nodes]]
+                    go_left = (x < v[:, 0]) | ((x == v[:, 0]) & (y < v[:, 1]))
+                else:
+                    ends = self._segment_ends[self._key[nodes]]
+                    a, b = self._xy[ends[:, 0]], self._xy[ends[:, 1]]
+                    go_left = (b[:, 0] - a[:, 0]) * (y - a[:, 1]) - (b[:, 1] - a[:, 1]) * (x - a[:, 0]) > 0
+                current[idx] = np.where(go_left, self._left[nodes], self._right[nodes])
+            if (kinds == _LEAF).all():
+                break
+        return self._key[current]
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the size of the frozen search structure in bytes."""
+        return sum(a.nbytes for a in (self._kind, self._key, self._left, self._right, self._xy, self._segment_ends))
+    pass
@@ -0,0 +1,129 @@
+"""Triangulation of many rings at once, optionally spread over a process pool."""
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence
+
+import numpy as np
+
+from lib.triangulation import earcut_array
+from lib.triangulation.cache import TriangulationCache
+from lib.triangulation.delaunay import delaunay_flips
+from lib.triangulation.earcut import earcut
+from lib.triangulation.monotone import monotone
+
+
+# Rings with at least this many vertices (holes included) are triangulated by earcut_array.
+ARRAY_EARCUT_MIN_VERTICES = 1000
+
+# Below this many vertices in total a pool costs more than it saves.
+POOL_MIN_VERTICES = 20000
+
+CHUNKS_PER_WORKER = 4
+
+ENGINES = ('earcut', 'monotone')
+
+_cache: Optional[TriangulationCache] = None
+
+
+def set_triangulation_cache(cache: Optional[TriangulationCache]):
+    """Makes triangulate and triangulate_many look up and store their results in CACHE.
+
+    Every triangulation in this process goes through these two functions, Polygon's
+    included, and pool workers forked afterwards inherit the cache. None turns it off.
+    """
+    global _cache
+    _cache = cache
+
+
+def triangulate(data, hole_indices: Optional[list[int]] = None, engine: str = 'earcut',
+                delaunay: bool = False) -> np.ndarray:
+    """Triangulates one flat x, y coordinate array and returns a (T, 3) int32 array of vertex indices.
+
+    ENGINE 'earcut' runs earcut; both of its ports return the same triangles, and the
+    array port is only worth its setup on large rings. 'monotone' decomposes the ring
+    into y-monotone pieces in expected O(n log n), which also holds for inputs that drive
+    earcut towards quadratic time, but it needs rings that neither cross nor touch.
+
+    With DELAUNAY the diagonals are then flipped until the triangulation is constrained
+    Delaunay, which replaces long slivers with rounder triangles.
+    """
+    if _cache is None:
+        return _triangulate(data, hole_indices, engine, delaunay)
+    key = _cache.key(data, hole_indices, engine, delaunay)
+    if (triangles := _cache.get(key)) is None:
+        triangles = _triangulate(data, hole_indices, engine, delaunay)
+        _cache.put(key, triangles)
+    return triangles
+
+
+def _triangulate(data, hole_indices: Optional[list[int]], engine: str, delaunay: bool) -> np.ndarray:
+    if engine == 'monotone':
+        impl = monotone
+    elif engine == 'earcut':
+        n = data.size // 2 if isinstance(data, np.ndarray) else len(data) // 2
+        impl = earcut_array.earcut if n >= ARRAY_EARCUT_MIN_VERTICES else earcut
+    else:
+        raise ValueError(f"Unknown triangulation engine: {engine}")
+    triangles = np.array(impl(data, hole_indices), dtype=np.int32).reshape(-1, 3)
+    return delaunay_flips(data, triangles) if delaunay else triangles
+
+
+def _triangulate_chunk(items: list[tuple], engine: str, delaunay: bool) -> list[np.ndarray]:
+    return [_triangulate(data, hole_indices, engine, delaunay) for data, hole_indices in items]
+
+
+def _balanced_chunks(sizes: list[int], count: int) -> list[list[int]]:
+    """Splits the indices of SIZES into COUNT chunks of about the same total size.
+
+    The largest items are placed first, each into the chunk with the smallest total so far.
+    """
+    heap = [(0, c) for c in range(count)]
+    chunks = [[] for _ in range(count)]
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i]):
+        total, c = heapq.heappop(heap)
+        chunks[c].append(i)
+        heapq.heappush(heap, (total + sizes[i], c))
+    return [chunk for chunk in chunks if chunk]
+
+
+def triangulate_many(rings: Sequence, hole_indices: Sequence[Optional[list[int]]] = None,
+                     workers: int = None, engine: str = 'earcut', delaunay: bool = False) -> list[np.ndarray]:
+    """Triangulates every flat x, y coordinate array of RINGS with ENGINE and DELAUNAY, see triangulate.
+
+    HOLE_INDICES, if given, holds the earcut hole indices (or None) of every ring. The
+    rings are split into chunks of similar vertex counts that a pool of WORKERS processes
+    (all cores by default) triangulates; small inputs are done in this process. The
+    results come back in the order of RINGS.
+    """
+    rings = [np.ascontiguousarray(data, dtype=np.float64).reshape(-1) for data in rings]
+    items = list(zip(rings, hole_indices if hole_indices is not None else [None] * len(rings)))
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # Cached rings are looked up here, so that only the others reach the pool.
+    results = [None] * len(items)
+    keys = []
+    if _cache is not None:
+        keys = [_cache.key(data, holes, engine, delaunay) for data, holes in items]
+        results = [_cache.get(key) for key in keys]
+    pending = [i for i, triangles in enumerate(results) if triangles is None]
+
+    sizes = [len(items[i][0]) // 2 for i in pending]
+    if workers <= 1 or len(pending) < 2 or sum(sizes) < POOL_MIN_VERTICES:
+        computed = _triangulate_chunk([items[i] for i in pending], engine, delaunay)
+        for i, triangles in zip(pending, computed):
+            results[i] = triangles
+    else:
+        chunks = [[pending[j] for j in chunk] for chunk in _balanced_chunks(sizes, workers * CHUNKS_PER_WORKER)]
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_triangulate_chunk, [items[i] for i in chunk], engine, delaunay)
+                       for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                for i, triangles in zip(chunk, future.result()):
+                    results[i] = triangles
+
+    if _cache is not None:
+        for i in pending:
+            _cache.put(keys[i], results[i])
+    return results
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import tempfile
+import time
+from typing import Optional
+
+import numpy as np
+
+
+# Part of every key, so that a change in how triangulations are computed or stored
+# leaves the old entries unused; they age out through the LRU eviction.
+CACHE_FORMAT_VERSION = 1
+
+
+class TriangulationCache:
+    """Triangle index arrays on disk, stored under a digest of the polygon coordinates.
+
+    Every entry is an .npy file named after the digest of its coordinate buffer, hole
+    indices and triangulation options, so unchanged polygons map to the same entry in
+    any process and at any time. Reading an entry refreshes its modification time, and
+    once the directory holds more than MAX_BYTES the entries that were least recently
+    used are deleted. Writes go through a temporary file and a rename, so concurrent
+    processes never see partial entries.
+    """
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = 256 * 2 ** 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.nbytes = sum(size for _, _, size in self._entries())
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(xy: np.ndarray, hole_indices: Optional[list[int]] = None, engine: str = 'earcut',
+            delaunay: bool = False) -> str:
+        """Returns the digest of the coordinates XY together with the triangulation inputs."""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f'{CACHE_FORMAT_VERSION}:{engine}:{int(delaunay)}:{list(hole_indices or ())}:'.encode())
+        digest.update(np.ascontiguousarray(xy, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.npy')
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Returns the (T, 3) triangle array stored under KEY, or None."""
+        path = self._path(key)
+        try:
+            triangles = np.load(path, allow_pickle=False)
+            self._touch(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return triangles
+
+    def put(self, key: str, triangles: np.ndarray):
+        """Stores TRIANGLES under KEY and evicts the least recently used entries over the budget."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(triangles, dtype=np.int32))
+            # An entry that is overwritten no longer counts towards the budget.
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp, path)
+            self._touch(path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.nbytes += os.path.getsize(path) - replaced
+        if self.max_bytes is not None and self.nbytes > self.max_bytes:
+            self._evict()
+
+    @staticmethod
+    def _touch(path: str):
+        # Set explicitly: the implicit update follows the file system clock, which can be
+        # too coarse to order entries used in quick succession.
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _entries(self) -> list[tuple[float, str, int]]:
+        """Returns the modification time in ns, path and size of every entry."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.npy'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        # Other processes may share the directory, so the sizes are read afresh.
+        entries = sorted(self._entries())
+        self.nbytes = sum(size for _, _, size in entries)
+        for _, path, size in entries[:-1]:
+            if self.nbytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.nbytes -= size
+        return
+
+    def clear(self):
+        for _, path, _ in self._entries():
+            os.remove(path)
+        self.nbytes = 0
+    pass
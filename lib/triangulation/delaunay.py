@@ -0,0 +1,68 @@
+"""Constrained Delaunay refinement of polygon triangulations by edge flips (Lawson)."""
+import numpy as np
+
+
+def _orient(xs, ys, a: int, b: int, c: int) -> float:
+    return (xs[b] - xs[a]) * (ys[c] - ys[a]) - (ys[b] - ys[a]) * (xs[c] - xs[a])
+
+
+def _in_circle(xs, ys, a: int, b: int, c: int, d: int) -> bool:
+    """True if d lies clearly inside the circumcircle of the counter-clockwise triangle a, b, c."""
+    adx, ady = xs[a] - xs[d], ys[a] - ys[d]
+    bdx, bdy = xs[b] - xs[d], ys[b] - ys[d]
+    cdx, cdy = xs[c] - xs[d], ys[c] - ys[d]
+    alift, blift, clift = adx * adx + ady * ady, bdx * bdx + bdy * bdy, cdx * cdx + cdy * cdy
+    det = (alift * (bdx * cdy - cdx * bdy) + blift * (cdx * ady - adx * cdy) + clift * (adx * bdy - bdx * ady))
+    # Nearly cocircular quads are left alone, so rounding cannot make two flips undo each other.
+    scale = (alift * abs(bdx * cdy - cdx * bdy) + blift * abs(cdx * ady - adx * cdy)
+             + clift * abs(adx * bdy - bdx * ady))
+    return det > 1e-10 * scale
+
+
+def delaunay_flips(xy, triangles) -> np.ndarray:
+    """Flips the diagonals of a polygon triangulation until it is constrained Delaunay.
+
+    XY holds the vertex coordinates and TRIANGLES the (T, 3) vertex indices, as returned by
+    lib.triangulation.batch.triangulate. Edges that belong to a single triangle are the
+    outline and hole boundaries and are never flipped; every shared edge whose opposite
+    vertex lies inside the circumcircle of the other triangle is. Degenerate triangles
+    are flipped away whenever both replacements are proper. Returns a new (T, 3) int32
+    array of counter-clockwise triangles over the same vertices.
+    """
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    xs, ys = xy[:, 0].tolist(), xy[:, 1].tolist()
+    tris = np.asarray(triangles, dtype=np.int32).reshape(-1, 3).tolist()
+    if sum(_orient(xs, ys, *t) for t in tris) < 0:
+        tris = [[a, c, b] for a, b, c in tris]
+
+    # Every directed edge a -> b maps to the triangle that has it counter-clockwise.
+    owner: dict[tuple[int, int], int] = {}
+    for t, (a, b, c) in enumerate(tris):
+        owner[a, b] = owner[b, c] = owner[c, a] = t
+
+    def apex(t: int, a: int) -> int:
+        """The corner of triangle t opposite its edge a -> next."""
+        tri = tris[t]
+        return tri[(tri.index(a) + 2) % 3]
+
+    stack = [(a, b) for a, b in owner if a < b and (b, a) in owner]
+    while stack:
+        a, b = stack.pop()
+        if (t1 := owner.get((a, b))) is None or (t2 := owner.get((b, a))) is None:
+            continue
+        c, d = apex(t1, a), apex(t2, b)
+        if c == d or _orient(xs, ys, a, d, c) <= 0 or _orient(xs, ys, d, b, c) <= 0:
+            continue
+        proper = _orient(xs, ys, a, b, c) > 0 and _orient(xs, ys, b, a, d) > 0
+        if proper and not _in_circle(xs, ys, a, b, c, d):
+            continue
+
+        # The quad a, d, b, c is convex, so its other diagonal c - d replaces a - b.
+        del owner[a, b], owner[b, a]
+        tris[t1] = [a, d, c]
+        tris[t2] = [d, b, c]
+        owner[a, d] = owner[d, c] = owner[c, a] = t1
+        owner[d, b] = owner[b, c] = owner[c, d] = t2
+        stack += ((a, d), (d, b), (b, c), (c, a))
+
+    return np.array(tris, dtype=np.int32).reshape(-1, 3)
@@ -1,4 +1,10 @@
+import numpy as np
+
+
 def earcut(data, holeIndices=None, dim=2):
+    # Coordinate arrays, e.g. the buffer of a PointArray, are flattened in one go.
+    if hasattr(data, '__array__'):
+        data = np.asarray(data, dtype=np.float64).reshape(-1).tolist()
     hasHoles = holeIndices and len(holeIndices)
     outerLen = holeIndices[0] * dim if hasHoles else len(data)
     outerNode = linkedList(data, 0, outerLen, dim, True)
@@ -250,7 +256,9 @@ def eliminateHoles(data, holeIndices, outerNode, dim):
             list.steiner = True
         queue.append(getLeftmost(list))
 
-    queue = sorted(queue, key=lambda k: k.x, reverse=True)
+    # Left to right, as in earcut.js: a hole bridged later can then bridge to an earlier one
+    # instead of crossing it on its way to the outer ring.
+    queue = sorted(queue, key=lambda k: k.x)
 
     for i in range(len(queue)):
         eliminateHole(queue[i], outerNode)
@@ -325,77 +333,49 @@ def sectorContainsSector(m, p):
     return area(m.prev, m, p.prev) < 0 and area(p.next, m, m.next) < 0
 
 def indexCurve(start, minX, minY, invSize):
-    p = start
-
-    while True:
-        if (p.z == None):
-            p.z = zOrder(p.x, p.y, minX, minY, invSize)
-        p.prevZ = p.prev
-        p.nextZ = p.next
+    ring = [start]
+    p = start.next
+    while (p != start):
+        ring.append(p)
         p = p.next
-        if not (p != start):
-            break
 
-    p.prevZ.nextZ = None
-    p.prevZ = None
+    # The keys of the whole ring at once; a stable sort keeps the tie order of the
+    # linked list merge sort this replaces.
+    z = zOrderArray(np.array([q.x for q in ring]), np.array([q.y for q in ring]), minX, minY, invSize)
+    order = np.argsort(z, kind='stable').tolist()
+    z = z.tolist()
+
+    prev = None
+    for k in order:
+        p = ring[k]
+        p.z = z[k]
+        p.prevZ = prev
+        if (prev):
+            prev.nextZ = p
+        prev = p
+    prev.nextZ = None
 
-    sortLinked(p)
+def zOrder(x, y, minX, minY, invSize):
 
-def sortLinked(list):
-    inSize = 1
-    e = None
+    x = int(32767 * (x - minX) * invSize)
+    y = int(32767 * (y - minY) * invSize)
 
-    while True:
-        p = list
-        list = None
-        tail = None
-        numMerges = 0
-
-        while (p):
-            numMerges += 1
-            q = p
-            pSize = 0
-            for i in range(inSize):
-                pSize += 1
-                q = q.nextZ
-                if (not q):
-                    break
-
-            qSize = inSize
-
-            while (pSize > 0 or (qSize > 0 and q)):
-
-                if (pSize != 0 and (qSize == 0 or not q or p.z <= q.z)):
-                    e = p
-                    p = p.nextZ
-                    pSize -= 1
-                else:
-                    e = q
-                    q = q.nextZ
-                    qSize -= 1
-
-                if (tail):
-                    tail.nextZ = e
-                else:
-                    list = e
-
-                e.prevZ = tail
-                tail = e
-
-            p = q
-
-        tail.nextZ = None
-        inSize *= 2
-
-        if not (numMerges > 1):
-            break
+    x = (x | (x << 8)) & 0x00FF00FF
+    x = (x | (x << 4)) & 0x0F0F0F0F
+    x = (x | (x << 2)) & 0x33333333
+    x = (x | (x << 1)) & 0x55555555
 
-    return list
+    y = (y | (y << 8)) & 0x00FF00FF
+    y = (y | (y << 4)) & 0x0F0F0F0F
+    y = (y | (y << 2)) & 0x33333333
+    y = (y | (y << 1)) & 0x55555555
 
-def zOrder(x, y, minX, minY, invSize):
+    return x | (y << 1)
 
-    x = int(32767 * (x - minX) * invSize)
-    y = int(32767 * (y - minY) * invSize)
+def zOrderArray(x, y, minX, minY, invSize):
+    """zOrder of every point of the float64 arrays X and Y, as an int64 array."""
+    x = (32767 * (x - minX) * invSize).astype(np.int64)
+    y = (32767 * (y - minY) * invSize).astype(np.int64)
 
     x = (x | (x << 8)) & 0x00FF00FF
     x = (x | (x << 4)) & 0x0F0F0F0F
@@ -0,0 +1,593 @@
+"""Earcut over index arrays.
+
+A port of earcut.py that keeps the vertex rings in parallel arrays instead of Node
+objects: a node is an integer index, -1 stands for a missing link, and the node
+coordinates live in flat float64 arrays. The control flow follows earcut.py step by
+step, so both return exactly the same triangles.
+"""
+from array import array
+
+import numpy as np
+
+from lib.triangulation.earcut import pointInTriangle, signedArea, sign, zOrder, zOrderArray
+
+
+class _Nodes:
+    """The linked vertex rings of one earcut run, one array per Node field."""
+    __slots__ = ('i', 'x', 'y', 'prev', 'next', 'z', 'prevZ', 'nextZ', 'steiner')
+
+    def __init__(self):
+        self.i = array('q')
+        self.x = array('d')
+        self.y = array('d')
+        self.prev = array('q')
+        self.next = array('q')
+        self.z = array('q')
+        self.prevZ = array('q')
+        self.nextZ = array('q')
+        self.steiner = bytearray()
+
+    def add(self, i, x, y) -> int:
+        node = len(self.i)
+        self.i.append(i)
+        self.x.append(x)
+        self.y.append(y)
+        self.prev.append(-1)
+        self.next.append(-1)
+        self.z.append(-1)
+        self.prevZ.append(-1)
+        self.nextZ.append(-1)
+        self.steiner.append(0)
+        return node
+
+    def ring(self, i, x, y) -> int:
+        """Appends the vertices I at X, Y as one closed ring, in order, and returns its last node."""
+        first, n = len(self.i), len(i)
+        self.i.extend(i)
+        self.x.extend(x)
+        self.y.extend(y)
+        self.prev.extend(range(first - 1, first + n - 1))
+        self.next.extend(range(first + 1, first + n + 1))
+        self.prev[first] = first + n - 1
+        self.next[first + n - 1] = first
+        self.z.extend([-1] * n)
+        self.prevZ.extend([-1] * n)
+        self.nextZ.extend([-1] * n)
+        self.steiner.extend(bytes(n))
+        return first + n - 1
+
+
+def earcut(data, holeIndices=None, dim=2):
+    # Coordinates are kept as one flat float64 buffer instead of a list of float objects.
+    if hasattr(data, '__array__'):
+        data = array('d', np.ascontiguousarray(data, dtype=np.float64).tobytes())
+    else:
+        data = array('d', data)
+    nodes = _Nodes()
+    hasHoles = holeIndices and len(holeIndices)
+    outerLen = holeIndices[0] * dim if hasHoles else len(data)
+    outerNode = linkedList(nodes, data, 0, outerLen, dim, True)
+    triangles = []
+
+    if (outerNode < 0 or nodes.next[outerNode] == nodes.prev[outerNode]):
+        return triangles
+
+    minX = None
+    minY = None
+    invSize = None
+
+    if (hasHoles):
+        outerNode = eliminateHoles(nodes, data, holeIndices, outerNode, dim)
+
+    if (len(data) > 80 * dim):
+        minX = maxX = data[0]
+        minY = maxY = data[1]
+
+        for i in range(dim, outerLen, dim):
+            x = data[i]
+            y = data[i + 1]
+            if (x < minX):
+                minX = x
+            if (y < minY):
+                minY = y
+            if (x > maxX):
+                maxX = x
+            if (y > maxY):
+                maxY = y
+
+        invSize = max(maxX - minX, maxY - minY)
+        invSize = 1 / invSize if invSize != 0 else 0
+
+    earcutLinked(nodes, outerNode, triangles, dim, minX, minY, invSize)
+
+    return triangles
+
+
+def linkedList(nodes, data, start, end, dim, clockwise):
+
+    if (clockwise == (signedArea(data, start, end, dim) > 0)):
+        order = range(start, end, dim)
+    else:
+        order = range(end - dim, start - 1, -dim)
+
+    if (not len(order)):
+        return -1
+
+    last = nodes.ring(order, [data[i] for i in order], [data[i + 1] for i in order])
+
+    if (equals(nodes, last, nodes.next[last])):
+        removeNode(nodes, last)
+        last = nodes.next[last]
+
+    return last
+
+
+def filterPoints(nodes, start, end=-1):
+    if (start < 0):
+        return start
+    if (end < 0):
+        end = start
+
+    prev, next, steiner = nodes.prev, nodes.next, nodes.steiner
+    p = start
+
+    while True:
+        again = False
+
+        if (not steiner[p] and (equals(nodes, p, next[p]) or area(nodes, prev[p], p, next[p]) == 0)):
+            removeNode(nodes, p)
+            p = end = prev[p]
+            if (p == next[p]):
+                break
+            again = True
+
+        else:
+            p = next[p]
+
+        if not (again or p != end):
+            break
+
+    return end
+
+
+def earcutLinked(nodes, ear, triangles, dim, minX, minY, invSize, passs=None):
+    if (ear < 0):
+        return
+
+    if (not passs and invSize):
+        indexCurve(nodes, ear, minX, minY, invSize)
+
+    index, prevs, nexts = nodes.i, nodes.prev, nodes.next
+    stop = ear
+
+    while (prevs[ear] != nexts[ear]):
+        prev = prevs[ear]
+        next = nexts[ear]
+
+        if (isEarHashed(nodes, ear, minX, minY, invSize) if invSize else isEar(nodes, ear)):
+
+            triangles.append(index[prev] // dim)
+            triangles.append(index[ear] // dim)
+            triangles.append(index[next] // dim)
+
+            removeNode(nodes, ear)
+
+            ear = nexts[next]
+            stop = nexts[next]
+
+            continue
+
+        ear = next
+
+        if (ear == stop):
+
+            if (not passs):
+                earcutLinked(nodes, filterPoints(nodes, ear), triangles, dim, minX, minY, invSize, 1)
+
+            elif (passs == 1):
+                ear = cureLocalIntersections(nodes, filterPoints(nodes, ear), triangles, dim)
+                earcutLinked(nodes, ear, triangles, dim, minX, minY, invSize, 2)
+
+            elif (passs == 2):
+                splitEarcut(nodes, ear, triangles, dim, minX, minY, invSize)
+
+            break
+
+
+def isEar(nodes, ear):
+    xs, ys, prev, next = nodes.x, nodes.y, nodes.prev, nodes.next
+    a = prev[ear]
+    b = ear
+    c = next[ear]
+
+    if (area(nodes, a, b, c) >= 0):
+        return False
+
+    ax, ay, bx, by, cx, cy = xs[a], ys[a], xs[b], ys[b], xs[c], ys[c]
+    p = next[c]
+
+    minTX = (ax if ax < cx else cx) if ax < bx else (bx if bx < cx else cx)
+    minTY = (ay if ay < cy else cy) if ay < by else (by if by < cy else cy)
+    maxTX = (ax if ax > cx else cx) if ax > bx else (bx if bx > cx else cx)
+    maxTY = (ay if ay > cy else cy) if ay > by else (by if by > cy else cy)
+
+    while (p != a):
+        px, py = xs[p], ys[p]
+        if (minTX <= px <= maxTX and minTY <= py <= maxTY and
+                (cx - px) * (ay - py) - (ax - px) * (cy - py) >= 0 and
+                (ax - px) * (by - py) - (bx - px) * (ay - py) >= 0 and
+                (bx - px) * (cy - py) - (cx - px) * (by - py) >= 0 and
+                _reflex(xs, ys, prev[p], p, next[p])):
+            return False
+        p = next[p]
+
+    return True
+
+
+def isEarHashed(nodes, ear, minX, minY, invSize):
+    xs, ys, prev, next, z, prevZ, nextZ = nodes.x, nodes.y, nodes.prev, nodes.next, nodes.z, nodes.prevZ, nodes.nextZ
+    a = prev[ear]
+    b = ear
+    c = next[ear]
+
+    if (area(nodes, a, b, c) >= 0):
+        return False
+
+    ax, ay, bx, by, cx, cy = xs[a], ys[a], xs[b], ys[b], xs[c], ys[c]
+
+    # The bounding box test is cheaper than pointInTriangle and rejects most of the
+    # candidates in the z-order range; points outside it can never be inside the ear.
+    minTX = (ax if ax < cx else cx) if ax < bx else (bx if bx < cx else cx)
+    minTY = (ay if ay < cy else cy) if ay < by else (by if by < cy else cy)
+    maxTX = (ax if ax > cx else cx) if ax > bx else (bx if bx > cx else cx)
+    maxTY = (ay if ay > cy else cy) if ay > by else (by if by > cy else cy)
+
+    minZ = zOrder(minTX, minTY, minX, minY, invSize)
+    maxZ = zOrder(maxTX, maxTY, minX, minY, invSize)
+
+    p = prevZ[ear]
+    n = nextZ[ear]
+
+    while (p >= 0 and z[p] >= minZ and n >= 0 and z[n] <= maxZ):
+        if (p != a and p != c and
+                minTX <= xs[p] <= maxTX and minTY <= ys[p] <= maxTY and
+                _inside(ax, ay, bx, by, cx, cy, xs[p], ys[p]) and
+                _reflex(xs, ys, prev[p], p, next[p])):
+            return False
+        p = prevZ[p]
+
+        if (n != a and n != c and
+                minTX <= xs[n] <= maxTX and minTY <= ys[n] <= maxTY and
+                _inside(ax, ay, bx, by, cx, cy, xs[n], ys[n]) and
+                _reflex(xs, ys, prev[n], n, next[n])):
+            return False
+        n = nextZ[n]
+
+    while (p >= 0 and z[p] >= minZ):
+        if (p != a and p != c and
+                minTX <= xs[p] <= maxTX and minTY <= ys[p] <= maxTY and
+                _inside(ax, ay, bx, by, cx, cy, xs[p], ys[p]) and
+                _reflex(xs, ys, prev[p], p, next[p])):
+            return False
+        p = prevZ[p]
+
+    while (n >= 0 and z[n] <= maxZ):
+        if (n != a and n != c and
+                minTX <= xs[n] <= maxTX and minTY <= ys[n] <= maxTY and
+                _inside(ax, ay, bx, by, cx, cy, xs[n], ys[n]) and
+                _reflex(xs, ys, prev[n], n, next[n])):
+            return False
+        n = nextZ[n]
+
+    return True
+
+
+def _reflex(xs, ys, p, q, r):
+    """area(p, q, r) >= 0 on the coordinate arrays, without the node holder lookups."""
+    return (ys[q] - ys[p]) * (xs[r] - xs[q]) - (xs[q] - xs[p]) * (ys[r] - ys[q]) >= 0
+
+
+_inside = pointInTriangle
+
+
+def cureLocalIntersections(nodes, start, triangles, dim):
+    index, prev, next = nodes.i, nodes.prev, nodes.next
+    p = start
+
+    while True:
+        a = prev[p]
+        b = next[next[p]]
+
+        if (not equals(nodes, a, b) and intersects(nodes, a, p, next[p], b) and
+                locallyInside(nodes, a, b) and locallyInside(nodes, b, a)):
+
+            triangles.append(index[a] // dim)
+            triangles.append(index[p] // dim)
+            triangles.append(index[b] // dim)
+
+            removeNode(nodes, p)
+            removeNode(nodes, next[p])
+
+            p = start = b
+
+        p = next[p]
+
+        if not (p != start):
+            break
+
+    return filterPoints(nodes, p)
+
+
+def splitEarcut(nodes, start, triangles, dim, minX, minY, invSize):
+    index, prev, next = nodes.i, nodes.prev, nodes.next
+    a = start
+
+    while True:
+        b = next[next[a]]
+
+        while (b != prev[a]):
+            if (index[a] != index[b] and isValidDiagonal(nodes, a, b)):
+
+                c = splitPolygon(nodes, a, b)
+
+                a = filterPoints(nodes, a, next[a])
+                c = filterPoints(nodes, c, next[c])
+
+                earcutLinked(nodes, a, triangles, dim, minX, minY, invSize)
+                earcutLinked(nodes, c, triangles, dim, minX, minY, invSize)
+                return
+
+            b = next[b]
+
+        a = next[a]
+        if not (a != start):
+            break
+
+
+def eliminateHoles(nodes, data, holeIndices, outerNode, dim):
+    queue = []
+
+    length = len(holeIndices)
+    for i in range(length):
+        start = holeIndices[i] * dim
+        end = holeIndices[i + 1] * dim if i < length - 1 else len(data)
+        list = linkedList(nodes, data, start, end, dim, False)
+        if (list == nodes.next[list]):
+            nodes.steiner[list] = 1
+        queue.append(getLeftmost(nodes, list))
+
+    queue = sorted(queue, key=lambda k: nodes.x[k])
+
+    for i in range(len(queue)):
+        eliminateHole(nodes, queue[i], outerNode)
+        outerNode = filterPoints(nodes, outerNode, nodes.next[outerNode])
+
+    return outerNode
+
+
+def eliminateHole(nodes, hole, outerNode):
+    outerNode = findHoleBridge(nodes, hole, outerNode)
+    if (outerNode >= 0):
+        b = splitPolygon(nodes, outerNode, hole)
+
+        filterPoints(nodes, outerNode, nodes.next[outerNode])
+        filterPoints(nodes, b, nodes.next[b])
+
+
+def findHoleBridge(nodes, hole, outerNode):
+    xs, ys, next = nodes.x, nodes.y, nodes.next
+    p = outerNode
+    hx = xs[hole]
+    hy = ys[hole]
+    qx = float("-inf")
+    m = -1
+
+    while True:
+        px, py, nx, ny = xs[p], ys[p], xs[next[p]], ys[next[p]]
+        if (hy <= py and hy >= ny and ny != py):
+            x = px + (hy - py) * (nx - px) / (ny - py)
+
+            if (x <= hx and x > qx):
+                qx = x
+                if (x == hx):
+                    if (hy == py):
+                        return p
+                    if (hy == ny):
+                        return next[p]
+
+                m = p if px < nx else next[p]
+
+        p = next[p]
+        if not (p != outerNode):
+            break
+
+    if (m < 0):
+        return -1
+
+    if (hx == qx):
+        return m
+
+    stop = m
+    mx = xs[m]
+    my = ys[m]
+    tanMin = float("inf")
+
+    p = m
+
+    while True:
+        px, py = xs[p], ys[p]
+        if (hx >= px and px >= mx and hx != px and
+                pointInTriangle(hx if hy < my else qx, hy, mx, my, qx if hy < my else hx, hy, px, py)):
+
+            tan = abs(hy - py) / (hx - px)
+
+            if (locallyInside(nodes, p, hole) and
+                    (tan < tanMin or (tan == tanMin and (px > xs[m] or (px == xs[m] and sectorContainsSector(nodes, m, p)))))):
+                m = p
+                tanMin = tan
+
+        p = next[p]
+        if not (p != stop):
+            break
+
+    return m
+
+
+def sectorContainsSector(nodes, m, p):
+    return (area(nodes, nodes.prev[m], m, nodes.prev[p]) < 0 and
+            area(nodes, nodes.next[p], m, nodes.next[m]) < 0)
+
+
+def indexCurve(nodes, start, minX, minY, invSize):
+    next = nodes.next
+    ring = [start]
+    p = next[start]
+    while (p != start):
+        ring.append(p)
+        p = next[p]
+
+    ring = np.array(ring, dtype=np.int64)
+    z = zOrderArray(np.array(nodes.x)[ring], np.array(nodes.y)[ring], minX, minY, invSize)
+    chain = ring[np.argsort(z, kind='stable')]
+
+    # Writable views of the node arrays; they must be gone before the next node is added.
+    zs, prevZ, nextZ = (np.frombuffer(a, dtype=np.int64) for a in (nodes.z, nodes.prevZ, nodes.nextZ))
+    zs[ring] = z
+    prevZ[chain[1:]] = chain[:-1]
+    nextZ[chain[:-1]] = chain[1:]
+    prevZ[chain[0]] = nextZ[chain[-1]] = -1
+    del zs, prevZ, nextZ
+
+
+def getLeftmost(nodes, start):
+    xs, ys, next = nodes.x, nodes.y, nodes.next
+    p = start
+    leftmost = start
+    while True:
+        if (xs[p] < xs[leftmost] or (xs[p] == xs[leftmost] and ys[p] < ys[leftmost])):
+            leftmost = p
+        p = next[p]
+        if not (p != start):
+            break
+
+    return leftmost
+
+
+def isValidDiagonal(nodes, a, b):
+    index, prev, next = nodes.i, nodes.prev, nodes.next
+
+    return index[next[a]] != index[b] and index[prev[a]] != index[b] and not intersectsPolygon(nodes, a, b) and \
+        (locallyInside(nodes, a, b) and locallyInside(nodes, b, a) and middleInside(nodes, a, b) and
+         (area(nodes, prev[a], a, prev[b]) or area(nodes, a, prev[b], b)) or
+         equals(nodes, a, b) and area(nodes, prev[a], a, next[a]) > 0 and area(nodes, prev[b], b, next[b]) > 0)
+
+
+def area(nodes, p, q, r):
+    xs, ys = nodes.x, nodes.y
+    return (ys[q] - ys[p]) * (xs[r] - xs[q]) - (xs[q] - xs[p]) * (ys[r] - ys[q])
+
+
+def equals(nodes, p1, p2):
+    return nodes.x[p1] == nodes.x[p2] and nodes.y[p1] == nodes.y[p2]
+
+
+def intersects(nodes, p1, q1, p2, q2):
+    o1 = sign(area(nodes, p1, q1, p2))
+    o2 = sign(area(nodes, p1, q1, q2))
+    o3 = sign(area(nodes, p2, q2, p1))
+    o4 = sign(area(nodes, p2, q2, q1))
+
+    if (o1 != o2 and o3 != o4):
+        return True
+
+    if (o1 == 0 and onSegment(nodes, p1, p2, q1)):
+        return True
+    if (o2 == 0 and onSegment(nodes, p1, q2, q1)):
+        return True
+    if (o3 == 0 and onSegment(nodes, p2, p1, q2)):
+        return True
+    if (o4 == 0 and onSegment(nodes, p2, q1, q2)):
+        return True
+
+    return False
+
+
+def onSegment(nodes, p, q, r):
+    xs, ys = nodes.x, nodes.y
+    return (xs[q] <= max(xs[p], xs[r]) and xs[q] >= min(xs[p], xs[r]) and
+            ys[q] <= max(ys[p], ys[r]) and ys[q] >= min(ys[p], ys[r]))
+
+
+def intersectsPolygon(nodes, a, b):
+    index, next = nodes.i, nodes.next
+    p = a
+
+    while True:
+        if (index[p] != index[a] and index[next[p]] != index[a] and index[p] != index[b] and
+                index[next[p]] != index[b] and intersects(nodes, p, next[p], a, b)):
+            return True
+        p = next[p]
+        if not (p != a):
+            break
+
+    return False
+
+
+def locallyInside(nodes, a, b):
+    prev, next = nodes.prev, nodes.next
+    return area(nodes, a, b, next[a]) >= 0 and area(nodes, a, prev[a], b) >= 0 if \
+        area(nodes, prev[a], a, next[a]) < 0 else \
+        area(nodes, a, b, prev[a]) < 0 or area(nodes, a, next[a], b) < 0
+
+
+def middleInside(nodes, a, b):
+    xs, ys, next = nodes.x, nodes.y, nodes.next
+    p = a
+    inside = False
+    px = (xs[a] + xs[b]) / 2
+    py = (ys[a] + ys[b]) / 2
+
+    while True:
+        n = next[p]
+        if (((ys[p] > py) != (ys[n] > py)) and ys[n] != ys[p] and
+                (px < (xs[n] - xs[p]) * (py - ys[p]) / (ys[n] - ys[p]) + xs[p])):
+            inside = not inside
+        p = n
+
+        if not (p != a):
+            break
+
+    return inside
+
+
+def splitPolygon(nodes, a, b):
+    prev, next = nodes.prev, nodes.next
+    a2 = nodes.add(nodes.i[a], nodes.x[a], nodes.y[a])
+    b2 = nodes.add(nodes.i[b], nodes.x[b], nodes.y[b])
+    an = next[a]
+    bp = prev[b]
+
+    next[a] = b
+    prev[b] = a
+
+    next[a2] = an
+    prev[an] = a2
+
+    next[b2] = a2
+    prev[a2] = b2
+
+    next[bp] = b2
+    prev[b2] = bp
+
+    return b2
+
+
+def removeNode(nodes, p):
+    prev, next, prevZ, nextZ = nodes.prev, nodes.next, nodes.prevZ, nodes.nextZ
+    next[prev[p]] = next[p]
+    prev[next[p]] = prev[p]
+
+    if (prevZ[p] >= 0):
+        nextZ[prevZ[p]] = nextZ[p]
+    if (nextZ[p] >= 0):
+        prevZ[nextZ[p]] = prevZ[p]
@@ -0,0 +1,308 @@
+"""Triangulation by decomposition into y-monotone pieces (de Berg et al., chapter 3).
+
+A sweep from top to bottom adds diagonals at split and merge vertices until every face
+is y-monotone, and every face is then triangulated in linear time with a stack. The
+sweep status is a skip list in x order, so the sweep takes expected O(n log n) time.
+Ties in y are broken by x, which acts as a tiny rotation of the plane, so horizontal
+edges need no special treatment. The input must be simple: rings may not cross or
+touch each other.
+"""
+from math import atan2
+from random import Random
+from typing import Callable, Optional
+
+import numpy as np
+
+
+_START, _END, _SPLIT, _MERGE, _REGULAR = range(5)
+
+
+def monotone(data, hole_indices: Optional[list[int]] = None) -> list[int]:
+    """Triangulates a flat x, y coordinate array with earcut's conventions.
+
+    HOLE_INDICES are the vertex indices where the holes start. Returns a flat list of
+    vertex indices, three per counter-clockwise triangle.
+    """
+    xy = np.ascontiguousarray(data, dtype=np.float64).reshape(-1, 2)
+    n = len(xy)
+    xs, ys = xy[:, 0].tolist(), xy[:, 1].tolist()
+
+    # Every ring is linked so that the interior lies to the left of each edge v -> nxt[v]:
+    # the outline counter-clockwise and the holes clockwise.
+    nxt, prv = [0] * n, [0] * n
+    vertices = []
+    bounds = [0, *(hole_indices or ()), n]
+    for r, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        ring = _dedup(xs, ys, range(start, end))
+        if len(ring) < 3:
+            if r == 0:
+                return []
+            continue
+        area = sum(xs[a] * ys[b] - xs[b] * ys[a] for a, b in zip(ring, ring[1:] + ring[:1]))
+        if (area > 0) != (r == 0):
+            ring.reverse()
+        for a, b in zip(ring, ring[1:] + ring[:1]):
+            nxt[a] = b
+            prv[b] = a
+        vertices += ring
+
+    diagonals = _monotone_diagonals(xs, ys, nxt, prv, vertices)
+    triangles = []
+    for face in _faces(xs, ys, nxt, prv, vertices, diagonals):
+        _triangulate_monotone(xs, ys, face, triangles)
+    return triangles
+
+
+def _dedup(xs: list[float], ys: list[float], ring: range) -> list[int]:
+    """Drops the vertices of RING that repeat the one before them."""
+    kept = []
+    for v in ring:
+        if not kept or xs[v] != xs[kept[-1]] or ys[v] != ys[kept[-1]]:
+            kept.append(v)
+    while len(kept) > 1 and xs[kept[0]] == xs[kept[-1]] and ys[kept[0]] == ys[kept[-1]]:
+        kept.pop()
+    return kept
+
+
+def _cross(xs, ys, a: int, b: int, c: int) -> float:
+    return (xs[b] - xs[a]) * (ys[c] - ys[a]) - (ys[b] - ys[a]) * (xs[c] - xs[a])
+
+
+class _Status:
+    """The edges cut by the sweep line, as a skip list ordered by their x at the line.
+
+    The edges never cross, so their order holds as the line moves down and positions can
+    be found by comparing EDGE_X with the x of the current vertex. Every operation takes
+    expected O(log n) time; the levels are drawn from a fixed seed, so the structure and
+    the result do not depend on the run.
+    """
+    _MAX_LEVEL = 32
+
+    def __init__(self, edge_x: Callable[[int], float]):
+        self._edge_x = edge_x
+        self._head: list[Optional[int]] = [None] * self._MAX_LEVEL
+        self._next: dict[int, list[Optional[int]]] = {}
+        self._levels = 1
+        self._random = Random(0)
+
+    def _links(self, e: Optional[int]) -> list[Optional[int]]:
+        return self._head if e is None else self._next[e]
+
+    def _before(self, x: float) -> list[Optional[int]]:
+        """Returns, per level, the last edge left of x, None where there is none."""
+        edge_x = self._edge_x
+        last = [None] * self._levels
+        e = None
+        for level in reversed(range(self._levels)):
+            while (f := self._links(e)[level]) is not None and edge_x(f) < x:
+                e = f
+            last[level] = e
+        return last
+
+    def insert(self, e: int, x: float):
+        """Inserts E, which meets the sweep line at x, before the edges at or right of x."""
+        height = 1
+        while height < self._MAX_LEVEL and self._random.random() < 0.5:
+            height += 1
+        self._levels = max(self._levels, height)
+        last = self._before(x)
+        links = self._next[e] = [None] * height
+        for level in range(height):
+            before = self._links(last[level])
+            links[level] = before[level]
+            before[level] = e
+
+    def remove(self, e: int, x: float):
+        """Removes E, which meets the sweep line at x; other edges may meet it there too."""
+        last = self._before(x)
+        links = self._next.pop(e)
+        for level in range(len(links)):
+            before = last[level]
+            while (f := self._links(before)[level]) != e:
+                before = f
+            self._links(before)[level] = links[level]
+
+    def left_of(self, x: float) -> int:
+        """Returns the last edge left of x."""
+        return self._before(x)[0]
+
+
+def _monotone_diagonals(xs, ys, nxt, prv, vertices: list[int]) -> set[tuple[int, int]]:
+    """Sweeps the rings from top to bottom and returns the diagonals that make every face y-monotone."""
+    def above(a: int, b: int) -> bool:
+        return ys[a] > ys[b] or (ys[a] == ys[b] and xs[a] < xs[b])
+
+    def kind(v: int) -> int:
+        u, w = prv[v], nxt[v]
+        convex = _cross(xs, ys, u, v, w) > 0
+        if above(v, u) and above(v, w):
+            return _START if convex else _SPLIT
+        if above(u, v) and above(w, v):
+            return _END if convex else _MERGE
+        return _REGULAR
+
+    sweep_x = sweep_y = 0.0
+
+    def edge_x(e: int) -> float:
+        """The x coordinate of the edge e -> nxt[e] at the sweep line.
+
+        Under the tie breaking rotation a horizontal edge meets the sweep line at the
+        current vertex, which is on it whenever the edge is looked up.
+        """
+        f = nxt[e]
+        ax, ay, bx, by = xs[e], ys[e], xs[f], ys[f]
+        if ay == by:
+            return min(max(sweep_x, min(ax, bx)), max(ax, bx))
+        if sweep_y == ay:
+            return ax
+        if sweep_y == by:
+            return bx
+        return ax + (sweep_y - ay) * (bx - ax) / (by - ay)
+
+    # The status holds the edges on the left boundary of the interior, ordered by x at the sweep line.
+    status = _Status(edge_x)
+    helper: dict[int, int] = {}
+    kinds = {v: kind(v) for v in vertices}
+    diagonals = set()
+
+    def connect(v: int, h: int):
+        diagonals.add((min(v, h), max(v, h)))
+
+    remove, insert, left_of = status.remove, status.insert, status.left_of
+
+    for v in sorted(vertices, key=lambda v: (-ys[v], xs[v])):
+        sweep_x, sweep_y, k = xs[v], ys[v], kinds[v]
+        x = sweep_x
+        if k == _START:
+            insert(v, x)
+            helper[v] = v
+        elif k == _END:
+            e = prv[v]
+            if kinds[helper[e]] == _MERGE:
+                connect(v, helper[e])
+            remove(e, x)
+        elif k == _SPLIT:
+            e = left_of(x)
+            connect(v, helper[e])
+            helper[e] = v
+            insert(v, x)
+            helper[v] = v
+        elif k == _MERGE:
+            e = prv[v]
+            if kinds[helper[e]] == _MERGE:
+                connect(v, helper[e])
+            remove(e, x)
+            e = left_of(x)
+            if kinds[helper[e]] == _MERGE:
+                connect(v, helper[e])
+            helper[e] = v
+        elif above(prv[v], v):
+            # On a left boundary: the interior lies to the right of v.
+            e = prv[v]
+            if kinds[helper[e]] == _MERGE:
+                connect(v, helper[e])
+            remove(e, x)
+            insert(v, x)
+            helper[v] = v
+        else:
+            e = left_of(x)
+            if kinds[helper[e]] == _MERGE:
+                connect(v, helper[e])
+            helper[e] = v
+    return diagonals
+
+
+def _faces(xs, ys, nxt, prv, vertices: list[int], diagonals: set[tuple[int, int]]):
+    """Yields the vertex cycles, interior to the left, that the diagonals cut the rings into."""
+    # Around every vertex with diagonals its neighbors are sorted counter-clockwise.
+    around: dict[int, list[int]] = {}
+    for a, b in diagonals:
+        around.setdefault(a, [prv[a], nxt[a]]).append(b)
+        around.setdefault(b, [prv[b], nxt[b]]).append(a)
+    for v, neighbors in around.items():
+        neighbors.sort(key=lambda u: atan2(ys[u] - ys[v], xs[u] - xs[v]))
+
+    def step(a: int, b: int) -> int:
+        """The vertex after b when a face with the interior on its left is walked from a to b."""
+        if (neighbors := around.get(b)) is None:
+            return nxt[b]
+        # The sharpest left turn: the next neighbor clockwise from a.
+        return neighbors[neighbors.index(a) - 1]
+
+    unused = {(v, nxt[v]) for v in vertices}
+    unused.update(diagonals)
+    unused.update((b, a) for a, b in diagonals)
+    while unused:
+        start = a, b = unused.pop()
+        face = [a]
+        while True:
+            face.append(b)
+            a, b = b, step(a, b)
+            if (a, b) == start:
+                break
+            unused.discard((a, b))
+        face.pop()
+        yield face
+
+
+def _triangulate_monotone(xs, ys, face: list[int], triangles: list[int]):
+    """Triangulates a y-monotone cycle with the interior on its left in linear time."""
+    m = len(face)
+    if m < 3:
+        return
+
+    def key(v: int) -> tuple[float, float]:
+        return ys[v], -xs[v]
+
+    top = max(range(m), key=lambda i: key(face[i]))
+    bottom = min(range(m), key=lambda i: key(face[i]))
+
+    # Walking forward from the top runs down the left chain, walking backwards down the right one.
+    left, right = [], []
+    i = top
+    while i != bottom:
+        left.append(face[i])
+        i = (i + 1) % m
+    i = (top - 1) % m
+    while i != bottom:
+        right.append(face[i])
+        i = (i - 1) % m
+
+    # Merge both chains into one top to bottom order, remembering the side of every vertex.
+    order = []
+    li = ri = 0
+    while li < len(left) or ri < len(right):
+        if ri == len(right) or (li < len(left) and key(left[li]) >= key(right[ri])):
+            order.append((left[li], True))
+            li += 1
+        else:
+            order.append((right[ri], False))
+            ri += 1
+    order.append((face[bottom], None))
+
+    def emit(a: int, b: int, c: int):
+        if _cross(xs, ys, a, b, c) < 0:
+            b, c = c, b
+        triangles.extend((a, b, c))
+
+    stack = [order[0], order[1]]
+    for u, side in order[2:-1]:
+        if side != stack[-1][1]:
+            for j in range(len(stack) - 1):
+                emit(u, stack[j][0], stack[j + 1][0])
+            stack = [stack[-1], (u, side)]
+        else:
+            last = stack.pop()
+            while stack:
+                c = _cross(xs, ys, stack[-1][0], u, last[0])
+                # On the left chain last must stick out to the left of the diagonal, on the right chain to the right.
+                if (c < 0) if side else (c > 0):
+                    emit(u, last[0], stack[-1][0])
+                    last = stack.pop()
+                else:
+                    break
+            stack.extend((last, (u, side)))
+
+    u = order[-1][0]
+    for j in range(len(stack) - 1):
+        emit(u, stack[j][0], stack[j + 1][0])
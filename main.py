@@ -4,7 +4,9 @@ import matplotlib.pyplot as plt
 from matplotlib.backend_bases import MouseEvent
 
 from lib.point_location.kirkpatrick import MultiPolygonLocator
-from lib.point_location.geo.shapes import Point, Polygon
+from lib.point_location.geo.shapes import Point, polygons_from_parts, triangulate_polygons
+from lib.triangulation.batch import set_triangulation_cache
+from lib.triangulation.cache import TriangulationCache
 
 matplotlib.use('TkAgg')
 
@@ -14,12 +16,18 @@ show_edges = False  # You can change this to False to hide edges
 if __name__ == '__main__':
     fig = plt.figure()
 
+    # Unchanged shapes are not triangulated again on later runs.
+    set_triangulation_cache(TriangulationCache('.cache/triangulations'))
+
     with shapefile.Reader(f'data/forma.shp') as reader:
         shapes = reader.shapes()
 
     locator = MultiPolygonLocator()
 
-    continents_polygons = [Polygon([Point(p[0], p[1]) for p in island.points[:-1]]) for island in shapes[:10]]
+    # Every record may hold several outlines, each with its own holes.
+    continents_polygons = [polygon for island in shapes[:10]
+                           for polygon in polygons_from_parts(island.points, island.parts)]
+    triangulate_polygons(continents_polygons)
 
     skipped = locator.add_regions(continents_polygons)
 
@@ -27,6 +35,9 @@ if __name__ == '__main__':
         if i in skipped:
             continue
         plt.plot(continent.x, continent.y, 'b-')
+        for hole in continent.holes:
+            ring = [*hole, hole[0]]
+            plt.plot([p.x for p in ring], [p.y for p in ring], 'b-')
 
     def on_click(event: MouseEvent):
         ex, ey = event.xdata, event.ydata
@@ -39,9 +50,9 @@ if __name__ == '__main__':
              
                 if show_edges:
                     for edge in passthrough_edges:
-                        plt.plot(edge['x'], edge['y'], 'g-')  # Green lines for edges
+                        plt.plot(edge[:, 0], edge[:, 1], 'g-')  # Green lines for edges
                 # Plot the final path in red
-                plt.plot(path['x'], path['y'], 'r-')  # Red line for final path
+                plt.plot(path[:, 0], path[:, 1], 'r-')  # Red line for final path
                 is_valid = True
         elif locator.set_first_point(point):
             is_valid = True